@@ -0,0 +1,100 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from kuda.crawl import CrawlProgress, DeadLetterStore, crawl
+from kuda.crawl.sinks import JsonLinesSink
+from kuda.scrapers import fetch_workout_page
+from kuda.testing import SyntheticBodyspace
+
+
+def max_rss_mb(who: int) -> float:
+    """
+    Peak resident memory in MB of this process or its children.
+    """
+
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_load_test(args: argparse.Namespace) -> None:
+    """
+    Crawls a local synthetic bodyspace server through the full
+    fetch -> parse -> sink pipeline and reports throughput, fetch
+    latency percentiles and peak memory.
+    """
+
+    fetch_latencies: List[float] = []
+
+    def fetch(url: str) -> str:
+        start = time.perf_counter()
+        try:
+            return fetch_workout_page(url)
+        finally:
+            fetch_latencies.append(time.perf_counter() - start)
+
+    with SyntheticBodyspace(
+        latency=(args.min_latency, args.max_latency),
+        error_rate=args.error_rate,
+        n_components=args.components,
+        superset_rate=args.superset_rate,
+        dropset_rate=args.dropset_rate,
+        cardio_rate=args.cardio_rate,
+    ) as server, tempfile.TemporaryDirectory() as path:
+        links = server.links(args.pages)
+        sink = JsonLinesSink(os.path.join(path, "workouts.jsonl"))
+        start = time.perf_counter()
+        progress = crawl(
+            links,
+            sink,
+            DeadLetterStore(os.path.join(path, "dead_letters")),
+            fetch_workers=args.fetch_workers,
+            parse_processes=args.parse_processes,
+            progress=CrawlProgress(total=len(links)),
+            fetch=fetch,
+        )
+        sink.close()
+        elapsed = time.perf_counter() - start
+        progress.report()
+
+    p50, p90, p99 = np.percentile(
+        np.array(fetch_latencies) * 1000, [50, 90, 99]
+    )
+    print(f"Pages: {progress.done} in {elapsed:.2f}s")
+    print(f"Throughput: {progress.done / elapsed:.1f} pages/s")
+    print(f"Failed: {progress.failed} ({progress.error_rate:.1%})")
+    print(f"Fetch latency ms: p50 {p50:.1f} p90 {p90:.1f} p99 {p99:.1f}")
+    print(f"Peak RSS MB: {max_rss_mb(resource.RUSAGE_SELF):.1f}")
+    if args.parse_processes:
+        print(
+            "Peak parser process RSS MB: "
+            f"{max_rss_mb(resource.RUSAGE_CHILDREN):.1f}"
+        )
+
+
+def main() -> None:
+    """
+    Runs the load test with the command line options.
+    """
+
+    parser = argparse.ArgumentParser(description=run_load_test.__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--fetch-workers", type=int, default=16)
+    parser.add_argument("--parse-processes", type=int, default=0)
+    parser.add_argument("--min-latency", type=float, default=0.0)
+    parser.add_argument("--max-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--components", type=int, default=6)
+    parser.add_argument("--superset-rate", type=float, default=0.2)
+    parser.add_argument("--dropset-rate", type=float, default=0.1)
+    parser.add_argument("--cardio-rate", type=float, default=0.1)
+    run_load_test(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
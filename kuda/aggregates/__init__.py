@@ -0,0 +1 @@
+from kuda.aggregates.training import TrainingAggregates
@@ -0,0 +1,261 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kuda.scrapers.workout.scraper import Workout, get_workout_id
+
+# Week value used for the all-time per user aggregates
+ALL_WEEKS: str = "all"
+
+LBS_TO_KG: float = 0.45359237
+
+SUMMARY_FIELDS: List[str] = [
+    "workouts",
+    "sets",
+    "cardio_duration",
+    "rest_time_total",
+    "rest_time_count",
+]
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def workout_week(url: str) -> Optional[str]:
+    """
+    ISO week ("2018-W47") a workout was logged in. Workout ids are
+    MongoDB ObjectIds so the first 4 bytes are the creation timestamp.
+    """
+
+    try:
+        timestamp = int(get_workout_id(url)[:8], 16)
+    except ValueError:
+        return None
+    year, week, _ = datetime.fromtimestamp(
+        timestamp, tz=timezone.utc
+    ).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def estimate_one_rep_max(weight: float, reps: float) -> float:
+    """
+    Epley estimate of the one rep max for a set.
+    """
+
+    if reps <= 1:
+        return weight
+    return weight * (1 + reps / 30)
+
+
+class TrainingAggregates:
+    """
+    Materialised training aggregates per user and per user-week.
+
+    Workouts are folded into running totals as they're ingested so
+    refreshing never rebuilds from the raw workouts. Ingesting is
+    idempotent on the workout id. Averages are derived from the
+    totals when the tables are read.
+    """
+
+    def __init__(self):
+        # (username, week) -> SUMMARY_FIELDS totals
+        self._summary: Dict[Tuple[str, str], List[float]] = {}
+        # (username, week, muscle) -> volume (kg x reps)
+        self._muscle_volume: Dict[Tuple[str, str, str], float] = {}
+        # (username, week, exercise_name) -> best estimated 1RM (kg)
+        self._one_rep_max: Dict[Tuple[str, str, str], float] = {}
+        self._ingested: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._ingested)
+
+    def ingest(self, workouts: Iterable[Workout]) -> int:
+        """
+        Folds new workouts into the aggregates.
+        Returns the number of workouts that weren't already ingested.
+        """
+
+        ingested = 0
+        for workout in workouts:
+            id_ = get_workout_id(workout["url"])
+            if id_ in self._ingested:
+                continue
+            self._ingest_workout(workout)
+            self._ingested.add(id_)
+            ingested += 1
+        return ingested
+
+    def _ingest_workout(  # pylint: disable=too-many-locals
+        self, workout: Workout
+    ) -> None:
+        username = workout["username"]
+        keys = [(username, ALL_WEEKS)]
+        week = workout_week(workout["url"])
+        if week is not None:
+            keys.append((username, week))
+
+        sets = 0
+        rest_time_total = 0.0
+        rest_time_count = 0
+        muscle_volume: Dict[str, float] = {}
+        one_rep_max: Dict[str, float] = {}
+
+        for workout_component in workout.get("workout_components") or []:
+            sets += len(workout_component["sets"])
+            for set_ in workout_component["sets"]:
+                for set_component in set_["set_components"]:
+                    rest_time = _to_float(set_component.get("rest_time"))
+                    if rest_time is not None:
+                        rest_time_total += rest_time
+                        rest_time_count += 1
+
+                    weight = _to_float(set_component.get("weight"))
+                    reps = _to_float(set_component.get("reps"))
+                    metric = set_component.get("weight_metric")
+                    if weight is None or reps is None or reps <= 0:
+                        continue
+                    if metric == "lbs":
+                        weight *= LBS_TO_KG
+                    elif metric != "kg":
+                        continue
+
+                    muscle = set_component.get("exercise_muscle") or ""
+                    muscle_volume[muscle] = (
+                        muscle_volume.get(muscle, 0.0) + weight * reps
+                    )
+                    exercise = set_component["exercise_name"]
+                    one_rep_max[exercise] = max(
+                        one_rep_max.get(exercise, 0.0),
+                        estimate_one_rep_max(weight, reps),
+                    )
+
+        deltas = [
+            1,
+            sets,
+            _to_float(workout.get("cardio_duration")) or 0.0,
+            rest_time_total,
+            rest_time_count,
+        ]
+        for key in keys:
+            totals = self._summary.setdefault(key, [0.0] * len(deltas))
+            for index, delta in enumerate(deltas):
+                totals[index] += delta
+            for muscle, volume in muscle_volume.items():
+                self._muscle_volume[(*key, muscle)] = (
+                    self._muscle_volume.get((*key, muscle), 0.0) + volume
+                )
+            for exercise, estimate in one_rep_max.items():
+                self._one_rep_max[(*key, exercise)] = max(
+                    self._one_rep_max.get((*key, exercise), 0.0), estimate
+                )
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Workouts, sets, cardio duration and average rest time
+        per username and week.
+        """
+
+        pdf = pd.DataFrame(
+            [(*key, *totals) for key, totals in self._summary.items()],
+            columns=["username", "week", *SUMMARY_FIELDS],
+        )
+        pdf["average_rest_time"] = pdf["rest_time_total"] / pdf[
+            "rest_time_count"
+        ].replace(0, np.nan)
+        return pdf.drop(columns=["rest_time_total", "rest_time_count"])
+
+    def muscle_volume(self) -> pd.DataFrame:
+        """
+        Total volume (kg x reps) per username, week and muscle.
+        """
+
+        return pd.DataFrame(
+            [(*key, value) for key, value in self._muscle_volume.items()],
+            columns=["username", "week", "muscle", "volume"],
+        )
+
+    def one_rep_max(self) -> pd.DataFrame:
+        """
+        Best estimated one rep max (kg) per username, week and exercise.
+        """
+
+        return pd.DataFrame(
+            [(*key, value) for key, value in self._one_rep_max.items()],
+            columns=["username", "week", "exercise_name", "one_rep_max"],
+        )
+
+    def _tables(self) -> Dict[str, Tuple[List[str], Dict, int]]:
+        # file name -> (key columns, table, number of values per key)
+        return {
+            "summary.npz": (
+                ["username", "week"],
+                self._summary,
+                len(SUMMARY_FIELDS),
+            ),
+            "muscle_volume.npz": (
+                ["username", "week", "muscle"],
+                self._muscle_volume,
+                1,
+            ),
+            "one_rep_max.npz": (
+                ["username", "week", "exercise_name"],
+                self._one_rep_max,
+                1,
+            ),
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Writes the aggregates to a directory of compressed .npz files,
+        one array per column.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        for file_name, (key_columns, table, width) in self._tables().items():
+            keys = list(table.keys())
+            columns = {
+                column: np.array([key[i] for key in keys], dtype=str)
+                for i, column in enumerate(key_columns)
+            }
+            columns["values"] = np.array(
+                list(table.values()), dtype=np.float64
+            ).reshape(len(keys), width)
+            np.savez_compressed(os.path.join(path, file_name), **columns)
+
+        np.savez_compressed(
+            os.path.join(path, "ingested.npz"),
+            ids=np.array(sorted(self._ingested), dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TrainingAggregates":
+        """
+        Loads aggregates written by `save` so more workouts
+        can be ingested into them.
+        """
+
+        aggregates = cls()
+        for file_name, (
+            key_columns,
+            table,
+            width,
+        ) in aggregates._tables().items():
+            with np.load(os.path.join(path, file_name)) as store:
+                keys = zip(*(store[column].tolist() for column in key_columns))
+                values = store["values"].tolist()
+                if width == 1:
+                    values = [value for value, in values]
+                table.update(zip(keys, values))
+
+        with np.load(os.path.join(path, "ingested.npz")) as store:
+            aggregates._ingested = set(store["ids"].tolist())
+        return aggregates
@@ -0,0 +1,338 @@
+import argparse
+import os
+import sys
+from functools import partial
+from typing import Callable, List, Optional
+
+from kuda.crawl.archive import ArchiveReader, ArchiveWriter, archiving_fetch
+from kuda.crawl.dead_letter import (
+    DeadLetterStore,
+    parse_page,
+    refetch_dead_letters,
+    replay_dead_letters,
+)
+from kuda.crawl.dedup import ParseCache
+from kuda.crawl.links import read_links
+from kuda.crawl.pipeline import crawl, crawl_queue
+from kuda.crawl.progress import CrawlProgress
+from kuda.crawl.queue import WorkQueue, default_worker_id
+from kuda.crawl.sinks import open_sink
+from kuda.scrapers.workout.scraper import (
+    Workout,
+    fetch_workout_page,
+    parse_workout,
+    parse_workout_summary,
+    request_timeout,
+)
+
+
+def _fetch(
+    args: argparse.Namespace, archive: Optional[ArchiveWriter]
+) -> Callable[[str], str]:
+    fetch = partial(fetch_workout_page, timeout=args.timeout)
+    if archive is None:
+        return fetch
+    return archiving_fetch(archive, fetch)
+
+
+def _parse(args: argparse.Namespace) -> Callable[[str, str], Workout]:
+    return parse_workout_summary if args.summary_only else parse_workout
+
+
+def _parse_cache(args: argparse.Namespace) -> Optional[ParseCache]:
+    if not args.parse_cache:
+        return None
+    return ParseCache(args.parse_cache, summary_only=args.summary_only)
+
+
+def _crawl(args: argparse.Namespace) -> int:
+    links = read_links(args.links)
+    if args.limit is not None:
+        links = links[: args.limit]
+
+    sink = open_sink(args.output)
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    parse_cache = _parse_cache(args)
+    try:
+        progress = crawl(
+            links,
+            sink,
+            DeadLetterStore(args.dead_letters),
+            fetch_workers=args.fetch_workers,
+            parse_processes=args.parse_processes,
+            progress=CrawlProgress(
+                total=len(links),
+                interval=args.interval,
+                track_cache=parse_cache is not None,
+            ),
+            fetch=_fetch(args, archive),
+            parse=_parse(args),
+            parse_cache=parse_cache,
+        )
+    finally:
+        sink.close()
+        if archive is not None:
+            archive.close()
+        if parse_cache is not None:
+            parse_cache.close()
+    progress.report()
+    return 1 if progress.failed else 0
+
+
+def _reparse(args: argparse.Namespace) -> int:
+    dead_letters = DeadLetterStore(args.dead_letters)
+    sink = open_sink(args.output)
+    with ArchiveReader(args.archive) as archive:
+        progress = CrawlProgress(total=len(archive), interval=args.interval)
+        try:
+            for url, html in archive:
+                workout = parse_page(url, html, dead_letters)
+                if workout is not None:
+                    sink.write(workout)
+                progress.update(failed=workout is None)
+        finally:
+            sink.close()
+    progress.report()
+    return 1 if progress.failed else 0
+
+
+def _enqueue(args: argparse.Namespace) -> int:
+    queue = WorkQueue(args.queue)
+    added = queue.enqueue(read_links(args.links))
+    print(f"Added {added} links", file=sys.stderr)
+    return 0
+
+
+def _status(args: argparse.Namespace) -> int:
+    for status, count in WorkQueue(args.queue).counts().items():
+        print(f"{status:>8} {count}")
+    return 0
+
+
+def _worker(args: argparse.Namespace) -> int:
+    queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+    sink = open_sink(args.output)
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    parse_cache = _parse_cache(args)
+    try:
+        progress = crawl_queue(
+            queue,
+            args.worker_id,
+            sink,
+            DeadLetterStore(args.dead_letters),
+            batch_size=args.batch_size,
+            fetch_workers=args.fetch_workers,
+            parse_processes=args.parse_processes,
+            # No total, the workers share the queue's links
+            progress=CrawlProgress(
+                interval=args.interval,
+                track_cache=parse_cache is not None,
+            ),
+            fetch=_fetch(args, archive),
+            parse=_parse(args),
+            parse_cache=parse_cache,
+        )
+    finally:
+        sink.close()
+        if archive is not None:
+            archive.close()
+        if parse_cache is not None:
+            parse_cache.close()
+    progress.report()
+    return 0
+
+
+def _replay(args: argparse.Namespace) -> int:
+    dead_letters = DeadLetterStore(args.dead_letters)
+    progress = CrawlProgress(total=len(dead_letters), interval=args.interval)
+    sink = open_sink(args.output)
+    try:
+        for workout in replay_dead_letters(dead_letters):
+            sink.write(workout)
+            progress.update()
+        if args.refetch:
+            for workout in refetch_dead_letters(
+                dead_letters, fetch=_fetch(args, None)
+            ):
+                sink.write(workout)
+                progress.update()
+    finally:
+        sink.close()
+    progress.report()
+
+    remaining = dead_letters.summary()
+    for location, count in sorted(remaining.items(), key=lambda i: -i[1]):
+        print(f"{count:>8} {location}", file=sys.stderr)
+    return 1 if remaining else 0
+
+
+def _add_crawl_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="A .jsonl file or a directory of .json files",
+    )
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Concurrent page fetches (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        help="Parser processes, 0 parses in the fetch threads "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=request_timeout,
+        help="Seconds to wait for a page before it's a fetch failure "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--archive", help="Also write the raw pages to this archive"
+    )
+    parser.add_argument(
+        "--parse-cache",
+        help="SQLite file of parsed workouts keyed by page content hash, "
+        "pages already in it aren't parsed again. Entries are keyed by "
+        "the scraper's PARSER_VERSION too, so bumping it after a parser "
+        "change invalidates them",
+    )
+    parser.add_argument(
+        "--summary-only",
+        action="store_true",
+        help="Only parse the workout header: name, muscles used, "
+        "durations, energy level and rating",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    The kuda command's argument parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="kuda", description="Bodyspace workout crawler"
+    )
+    parser.add_argument(
+        "--dead-letters",
+        default="dead_letters",
+        help="Directory failed pages are written to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between progress reports (default: %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser(
+        "crawl", help="Fetch and parse workout links"
+    )
+    crawl_parser.add_argument(
+        "links", help="Link file: .csv (Links column), .json list or .txt"
+    )
+    _add_crawl_arguments(crawl_parser)
+    crawl_parser.add_argument(
+        "--limit", type=int, help="Only crawl the first N links"
+    )
+    crawl_parser.set_defaults(func=_crawl)
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Re-parse the dead lettered pages"
+    )
+    replay_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="A .jsonl file or a directory of .json files",
+    )
+    replay_parser.add_argument(
+        "--refetch",
+        action="store_true",
+        help="Also re-crawl the pages that failed to fetch",
+    )
+    replay_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=request_timeout,
+        help="Seconds to wait for a re-crawled page (default: %(default)s)",
+    )
+    replay_parser.set_defaults(func=_replay)
+
+    reparse_parser = subparsers.add_parser(
+        "reparse", help="Parse every page in a raw page archive"
+    )
+    reparse_parser.add_argument("archive", help="Archive directory")
+    reparse_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="A .jsonl file or a directory of .json files",
+    )
+    reparse_parser.set_defaults(func=_reparse)
+
+    queue_parser = subparsers.add_parser(
+        "queue", help="Manage a shared work queue of links"
+    )
+    queue_subparsers = queue_parser.add_subparsers(
+        dest="queue_command", required=True
+    )
+    enqueue_parser = queue_subparsers.add_parser(
+        "enqueue", help="Add links to the queue"
+    )
+    enqueue_parser.add_argument("queue", help="SQLite queue database path")
+    enqueue_parser.add_argument(
+        "links", help="Link file: .csv (Links column), .json list or .txt"
+    )
+    enqueue_parser.set_defaults(func=_enqueue)
+    status_parser = queue_subparsers.add_parser(
+        "status", help="Count links per status"
+    )
+    status_parser.add_argument("queue", help="SQLite queue database path")
+    status_parser.set_defaults(func=_status)
+
+    worker_parser = subparsers.add_parser(
+        "worker", help="Crawl links leased from a shared work queue"
+    )
+    worker_parser.add_argument("queue", help="SQLite queue database path")
+    _add_crawl_arguments(worker_parser)
+    worker_parser.add_argument(
+        "--worker-id",
+        default=default_worker_id(),
+        help="Unique worker name (default: %(default)s)",
+    )
+    worker_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Links leased at a time (default: %(default)s)",
+    )
+    worker_parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=300,
+        help="Lease length, heartbeated every third of it "
+        "(default: %(default)s)",
+    )
+    worker_parser.set_defaults(func=_worker)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs a kuda command, returning its exit code.
+    """
+
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
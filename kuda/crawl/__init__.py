@@ -0,0 +1,14 @@
+from kuda.crawl.archive import ArchiveReader, ArchiveWriter
+from kuda.crawl.dead_letter import (
+    DeadLetterStore,
+    refetch_dead_letters,
+    replay_dead_letters,
+    scrape_page,
+    scrape_workouts,
+)
+from kuda.crawl.dedup import ParseCache
+from kuda.crawl.links import read_links
+from kuda.crawl.pipeline import crawl, crawl_queue
+from kuda.crawl.progress import CrawlProgress
+from kuda.crawl.queue import WorkQueue
+from kuda.crawl.sinks import open_sink
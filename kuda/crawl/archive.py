@@ -0,0 +1,315 @@
+import json
+import mmap
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import zstandard
+
+from kuda.scrapers.workout.scraper import fetch_workout_page, get_workout_id
+
+# The dictionary new segments are compressed with, every dictionary
+# an archive was written with is also kept as dictionary-<dict id>
+DICTIONARY_FILE: str = "dictionary.zstd"
+DICTIONARY_PATTERN: str = "dictionary-{}.zstd"
+SEGMENT_SUFFIX: str = ".zst"
+INDEX_SUFFIX: str = ".idx.json"
+
+# workout id -> (offset, length, url) within a segment
+SegmentIndex = Dict[str, Tuple[int, int, str]]
+
+
+def _writer_id() -> str:
+    # Unique per writer so writers on several hosts, or several
+    # crawls on one host, never pick the same segment name
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _segment_name(writer_id: str) -> str:
+    # Leading timestamp so segments sort in the order they were started
+    return f"segment-{time.time_ns():020d}-{writer_id}"
+
+
+def _segment_names(path: str) -> List[str]:
+    # Only segments with an index, pages after a segment's last index
+    # write (e.g. the writer crashed) aren't readable
+    return sorted(
+        f[: -len(INDEX_SUFFIX)]
+        for f in os.listdir(path)
+        if f.endswith(INDEX_SUFFIX)
+    )
+
+
+def _write_atomically(path: str, data: bytes) -> None:
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def _read_dictionaries(path: str) -> Dict[int, zstandard.ZstdCompressionDict]:
+    # dict id -> dictionary, every frame records the id of the
+    # dictionary it was compressed with
+    dictionaries = {}
+    for name in os.listdir(path):
+        if name == DICTIONARY_FILE or (
+            name.startswith("dictionary-") and name.endswith(".zstd")
+        ):
+            with open(os.path.join(path, name), "rb") as f:
+                dictionary = zstandard.ZstdCompressionDict(f.read())
+            dictionaries[dictionary.dict_id()] = dictionary
+    return dictionaries
+
+
+def train_dictionary(pages: List[str], size: int = 112640) -> bytes:
+    """
+    Trains a zstd dictionary on sample pages. Workout pages share most
+    of their markup so a dictionary improves the per page compression
+    ratio a lot.
+    """
+
+    return zstandard.train_dictionary(
+        size, [page.encode("utf-8") for page in pages]
+    ).as_bytes()
+
+
+class ArchiveWriter:  # pylint: disable=too-many-instance-attributes
+    """
+    Packs raw workout pages into large segment files.
+
+    Every page is its own zstd frame so it can be decompressed alone,
+    each segment gets an index of workout id -> (offset, length, url)
+    rewritten every `index_interval` pages and when the segment is
+    closed, so a crash loses at most that many pages. A new segment is
+    started once `segment_size` bytes have been written. Segment names
+    are unique per writer so any number of writers can add to one
+    archive directory. `add` is thread safe.
+
+    A `dictionary` becomes the archive's dictionary for later writers,
+    pages compressed with earlier dictionaries stay readable.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = 256 * 1024 * 1024,
+        level: int = 3,
+        dictionary: Optional[bytes] = None,
+        index_interval: int = 1000,
+    ):
+        self.path = path
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        os.makedirs(path, exist_ok=True)
+
+        dictionary_path = os.path.join(path, DICTIONARY_FILE)
+        dict_data = None
+        if dictionary is not None:
+            dict_data = zstandard.ZstdCompressionDict(dictionary)
+            if not dict_data.dict_id():
+                # Readers find a frame's dictionary by its id
+                raise ValueError(
+                    "Archive dictionaries need a dict id, "
+                    "train them with train_dictionary"
+                )
+            _write_atomically(
+                os.path.join(
+                    path, DICTIONARY_PATTERN.format(dict_data.dict_id())
+                ),
+                dictionary,
+            )
+            _write_atomically(dictionary_path, dictionary)
+        elif os.path.exists(dictionary_path):
+            with open(dictionary_path, "rb") as f:
+                dict_data = zstandard.ZstdCompressionDict(f.read())
+        self._compressor = zstandard.ZstdCompressor(
+            level=level, dict_data=dict_data
+        )
+
+        self._writer_id = _writer_id()
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._index: SegmentIndex = {}
+        self._segment = ""
+
+    def _open_segment(self) -> BinaryIO:
+        self._segment = _segment_name(self._writer_id)
+        # "x" so an existing segment is never overwritten, it's kept
+        # open until the segment is closed
+        self._file = open(  # pylint: disable=consider-using-with
+            os.path.join(self.path, self._segment + SEGMENT_SUFFIX), "xb"
+        )
+        self._index = {}
+        return self._file
+
+    def _write_index(self) -> None:
+        if self._file is not None:
+            # The frames must be on disk before the index points to them
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        index_path = os.path.join(self.path, self._segment + INDEX_SUFFIX)
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._index))
+        os.replace(f"{index_path}.tmp", index_path)
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        self._write_index()
+        self._file.close()
+        self._file = None
+
+    def add(self, url: str, html: str) -> None:
+        """
+        Compresses and appends a page to the current segment.
+        """
+
+        frame = self._compressor.compress(html.encode("utf-8"))
+        with self._lock:
+            file = self._file or self._open_segment()
+            offset = file.tell()
+            file.write(frame)
+            self._index[get_workout_id(url)] = (offset, len(frame), url)
+            if offset + len(frame) >= self.segment_size:
+                self._close_segment()
+            elif len(self._index) % self.index_interval == 0:
+                self._write_index()
+
+    def close(self) -> None:
+        """
+        Writes the index of the current segment and closes it.
+        """
+
+        with self._lock:
+            self._close_segment()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def archiving_fetch(
+    writer: ArchiveWriter, fetch: Callable[[str], str] = fetch_workout_page
+) -> Callable[[str], str]:
+    """
+    Wraps a fetch function so every fetched page is also archived.
+    """
+
+    def _fetch(url: str) -> str:
+        html = fetch(url)
+        writer.add(url, html)
+        return html
+
+    return _fetch
+
+
+class ArchiveReader:
+    """
+    Reads pages from an archive written by `ArchiveWriter`.
+
+    Segments are memory-mapped so a random read of one page only
+    touches that page's frame. Iterating streams every page in
+    segment and offset order for bulk re-parse jobs. If a workout id
+    was archived more than once the latest copy is returned.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # dict id -> decompressor, 0 for frames without a dictionary
+        self._decompressors = {
+            dict_id: zstandard.ZstdDecompressor(dict_data=dictionary)
+            for dict_id, dictionary in _read_dictionaries(path).items()
+        }
+        self._decompressors[0] = zstandard.ZstdDecompressor()
+
+        self._segments = _segment_names(path)
+        self._maps: Dict[str, mmap.mmap] = {}
+        # workout id -> (segment, offset, length, url)
+        self._index: Dict[str, Tuple[str, int, int, str]] = {}
+        for segment in self._segments:
+            with open(
+                os.path.join(path, segment + INDEX_SUFFIX), encoding="utf-8"
+            ) as f:
+                for workout_id, (offset, length, url) in json.loads(
+                    f.read()
+                ).items():
+                    self._index[workout_id] = (segment, offset, length, url)
+
+    def _map(self, segment: str) -> mmap.mmap:
+        if segment not in self._maps:
+            with open(
+                os.path.join(self.path, segment + SEGMENT_SUFFIX), "rb"
+            ) as f:
+                self._maps[segment] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        return self._maps[segment]
+
+    def _read(self, segment: str, offset: int, length: int) -> str:
+        frame = self._map(segment)[offset : offset + length]
+        decompressor = self._decompressors[
+            zstandard.get_frame_parameters(frame).dict_id
+        ]
+        return decompressor.decompress(frame).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, workout_id: str) -> bool:
+        return workout_id in self._index
+
+    def get(self, workout_id: str) -> Optional[str]:
+        """
+        The page of a workout id, None if it isn't archived.
+        """
+
+        if workout_id not in self._index:
+            return None
+        segment, offset, length, _ = self._index[workout_id]
+        return self._read(segment, offset, length)
+
+    def get_url(self, url: str) -> Optional[str]:
+        """
+        The page of a workout url, None if it isn't archived.
+        """
+
+        return self.get(get_workout_id(url))
+
+    def urls(self) -> List[str]:
+        """
+        The url of every archived page.
+        """
+
+        return [url for _, _, _, url in self._index.values()]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (url, html) for every page in archive order.
+        """
+
+        current = None
+        for segment, offset, length, url in sorted(self._index.values()):
+            # Unmap finished segments so their pages can be evicted
+            if current is not None and segment != current:
+                self._maps.pop(current).close()
+            current = segment
+            yield url, self._read(segment, offset, length)
+
+    def close(self) -> None:
+        """
+        Unmaps the segments.
+        """
+
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps = {}
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,264 @@
+import json
+import os
+import tempfile
+import time
+import traceback
+from typing import Callable, Dict, Iterator, List, Optional, TypedDict
+
+from kuda.scrapers.workout.scraper import (
+    Workout,
+    fetch_workout_page,
+    get_workout_id,
+    parse_workout,
+)
+
+FETCH_STAGE: str = "fetch"
+PARSE_STAGE: str = "parse"
+
+
+class DeadLetter(TypedDict):
+    """
+    A page that failed to fetch or parse, stored as json.
+    """
+
+    url: str
+    stage: str
+    exception_type: str
+    exception_message: str
+    # "file:line in function" of the innermost frame that raised
+    location: str
+    traceback: str
+    failed_at: float
+    attempts: int
+
+
+def get_exception_location(exception: BaseException) -> str:
+    """
+    Where the exception was raised, e.g.
+    "scraper.py:124 in get_energy_level".
+    """
+
+    frames = traceback.extract_tb(exception.__traceback__)
+    if not frames:
+        return ""
+    frame = frames[-1]
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}"
+
+
+class DeadLetterStore:
+    """
+    Directory of pages that failed to fetch or parse.
+
+    Each dead letter is a `<workout id>.json` file with the url, the
+    exception and where it was raised, alongside a `<workout id>.html`
+    file holding the raw page for parse failures. Files are written
+    atomically so several workers can share a store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, url: str, extension: str) -> str:
+        return os.path.join(self.path, f"{get_workout_id(url)}.{extension}")
+
+    def _write(self, file_path: str, content: str) -> None:
+        # A temp file of its own, fetch threads of one process may
+        # write the same url at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+
+    def add(
+        self,
+        url: str,
+        exception: BaseException,
+        stage: str,
+        html: Optional[str] = None,
+    ) -> DeadLetter:
+        """
+        Records a failed page, keeping the attempt count of any
+        earlier dead letter for the same url.
+        """
+
+        previous = self.get(url)
+        dead_letter = DeadLetter(
+            url=url,
+            stage=stage,
+            exception_type=type(exception).__name__,
+            exception_message=str(exception),
+            location=get_exception_location(exception),
+            traceback="".join(traceback.format_exception(exception)),
+            failed_at=time.time(),
+            attempts=previous["attempts"] + 1 if previous else 1,
+        )
+        if html is not None:
+            self._write(self._file(url, "html"), html)
+        self._write(self._file(url, "json"), json.dumps(dead_letter))
+        if html is None:
+            # The html of an earlier parse failure is out of date
+            self._remove(self._file(url, "html"))
+        return dead_letter
+
+    def get(self, url: str) -> Optional[DeadLetter]:
+        """
+        The url's dead letter, None if it has none.
+        """
+
+        try:
+            with open(self._file(url, "json"), "r", encoding="utf-8") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def get_html(self, url: str) -> Optional[str]:
+        """
+        The stored html of a parse failure, None for fetch failures.
+        """
+
+        try:
+            with open(self._file(url, "html"), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+    def remove(self, url: str) -> None:
+        """
+        Deletes the url's dead letter and html, if it has any.
+        """
+
+        for extension in ("json", "html"):
+            self._remove(self._file(url, extension))
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        for file_name in sorted(os.listdir(self.path)):
+            if not file_name.endswith(".json"):
+                continue
+            with open(
+                os.path.join(self.path, file_name), "r", encoding="utf-8"
+            ) as f:
+                yield json.loads(f.read())
+
+    def __len__(self) -> int:
+        return sum(1 for f in os.listdir(self.path) if f.endswith(".json"))
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Count of dead letters per exception location,
+        handy for finding which parser branch to fix first.
+        """
+
+        counts: Dict[str, int] = {}
+        for dead_letter in self:
+            key = (
+                f"{dead_letter['stage']}: {dead_letter['exception_type']} "
+                f"at {dead_letter['location']}"
+            )
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+def scrape_page(
+    url: str,
+    dead_letters: DeadLetterStore,
+    fetch: Callable[[str], str] = fetch_workout_page,
+    parse: Callable[[str, str], Workout] = parse_workout,
+) -> Optional[Workout]:
+    """
+    Fetches and parses a single workout page. Any failure is written
+    to the dead letter store and None is returned instead of raising.
+    """
+
+    try:
+        html = fetch(url)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        dead_letters.add(url, e, stage=FETCH_STAGE)
+        return None
+    return parse_page(url, html, dead_letters, parse=parse)
+
+
+def parse_page(
+    url: str,
+    html: str,
+    dead_letters: DeadLetterStore,
+    parse: Callable[[str, str], Workout] = parse_workout,
+) -> Optional[Workout]:
+    """
+    Parses an already fetched page, dead lettering it on failure.
+    """
+
+    try:
+        return parse(url, html)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        dead_letters.add(url, e, stage=PARSE_STAGE, html=html)
+        return None
+
+
+def scrape_workouts(
+    urls: List[str],
+    dead_letters: DeadLetterStore,
+    fetch: Callable[[str], str] = fetch_workout_page,
+    parse: Callable[[str, str], Workout] = parse_workout,
+) -> Iterator[Workout]:
+    """
+    Scrapes workouts one page at a time, yielding the ones that parse.
+    Pages that fail end up in the dead letter store and the batch
+    carries on.
+    """
+
+    for url in urls:
+        workout = scrape_page(url, dead_letters, fetch=fetch, parse=parse)
+        if workout is not None:
+            yield workout
+
+
+def replay_dead_letters(
+    dead_letters: DeadLetterStore,
+    parse: Callable[[str, str], Workout] = parse_workout,
+) -> Iterator[Workout]:
+    """
+    Re-parses the stored html of the parse stage dead letters, e.g.
+    after a parser fix. Pages that now parse are yielded and removed
+    from the store, the rest have their dead letter updated.
+    Fetch stage dead letters have no html, see `refetch_dead_letters`.
+    """
+
+    for dead_letter in list(dead_letters):
+        if dead_letter["stage"] != PARSE_STAGE:
+            continue
+        url = dead_letter["url"]
+        html = dead_letters.get_html(url)
+        if html is None:
+            continue
+        workout = parse_page(url, html, dead_letters, parse=parse)
+        if workout is not None:
+            dead_letters.remove(url)
+            yield workout
+
+
+def refetch_dead_letters(
+    dead_letters: DeadLetterStore,
+    fetch: Callable[[str], str] = fetch_workout_page,
+    parse: Callable[[str, str], Workout] = parse_workout,
+) -> Iterator[Workout]:
+    """
+    Re-crawls the pages of the fetch stage dead letters, e.g. after
+    being rate limited. Pages that now fetch and parse are yielded and
+    removed from the store, the rest have their dead letter updated.
+    """
+
+    for dead_letter in list(dead_letters):
+        if dead_letter["stage"] != FETCH_STAGE:
+            continue
+        url = dead_letter["url"]
+        workout = scrape_page(url, dead_letters, fetch=fetch, parse=parse)
+        if workout is not None:
+            dead_letters.remove(url)
+            yield workout
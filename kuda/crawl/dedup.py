@@ -0,0 +1,160 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import List, Optional
+
+import lxml.html
+from lxml import etree
+
+from kuda.scrapers.workout.scraper import (
+    PARSER_VERSION,
+    Workout,
+    is_summary_tag,
+)
+
+# Fields that differ between copies of the same page
+PAGE_FIELDS: List[str] = ["url", "username"]
+
+
+def _has_class(class_name: str) -> str:
+    return (
+        "//*[contains(concat(' ', normalize-space(@class), ' '), "
+        f"' {class_name} ')]"
+    )
+
+
+# The nodes parse_workout reads, the rest of the page (ads, nav,
+# the user's profile) doesn't change the parsed workout
+WORKOUT_PANEL_XPATH: str = " | ".join(
+    [
+        _has_class("rowSectionHeader"),
+        _has_class("musclesWorked"),
+        "//*[starts-with(@wicketpath, 'logResultsPanel_workoutSummary')]",
+        _has_class("workout-footer"),
+        _has_class("exercise-overview"),
+        _has_class("exercise-details"),
+        _has_class("exercise-rest"),
+    ]
+)
+
+
+class ParseCache:
+    """
+    Persistent map of workout panel hash -> parsed workout, so pages
+    that are copies of one already parsed (the same link under merged
+    users, re-logged template workouts, empty workouts) skip parsing.
+
+    The hash covers only the panel nodes the parser reads, hashed with
+    lxml which is much cheaper than the BeautifulSoup parse. The url
+    and username are set from the page being looked up. Hashes are
+    salted with `version`, `PARSER_VERSION` by default, so a parser
+    change starts a fresh map.
+    With `summary_only` only the nodes `summary_strainer` keeps are
+    hashed, for caching `parse_workout_summary` results.
+    Safe to share between threads.
+
+    Like `WorkQueue` the rollback journal is used rather than WAL so
+    workers on several hosts can share a cache on a network path.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        version: str = PARSER_VERSION,
+        timeout: float = 60,
+        summary_only: bool = False,
+    ):
+        self.path = path
+        # Summaries and full workouts mustn't share cache entries
+        self.version = f"{version}-summary" if summary_only else version
+        self.summary_only = summary_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path,
+            timeout=timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS parsed "
+            "(hash TEXT PRIMARY KEY, workout TEXT NOT NULL)"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of the lookups that were hits.
+        """
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def key(self, html: str) -> str:
+        """
+        Hash of the workout panel of a page.
+        """
+
+        digest = hashlib.sha256(self.version.encode("utf-8"))
+        page = lxml.html.fromstring(html)
+        if self.summary_only:
+            # A python loop over the elements is cheaper than an xpath
+            # with this many class tests, hashing the exercises would
+            # cost more than the summary parse itself
+            nodes = [
+                node
+                for node in page.iter(etree.Element)
+                if is_summary_tag(node.tag, node.attrib)
+            ]
+        else:
+            nodes = page.xpath(WORKOUT_PANEL_XPATH)
+        for node in nodes:
+            digest.update(etree.tostring(node))
+        return digest.hexdigest()
+
+    def get(self, key: str, url: str) -> Optional[Workout]:
+        """
+        The cached workout for the hash with the page's url and
+        username, counting the hit or miss.
+        """
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT workout FROM parsed WHERE hash = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        workout = json.loads(row[0])
+        workout["url"] = url
+        workout["username"] = url.split("viewworkoutlog")[1].split("/")[1]
+        return workout
+
+    def put(self, key: str, workout: Workout) -> None:
+        """
+        Caches a parsed workout under its page's hash.
+        """
+
+        stored = {k: v for k, v in workout.items() if k not in PAGE_FIELDS}
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO parsed (hash, workout) VALUES (?, ?)",
+                (key, json.dumps(stored)),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM parsed"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+
+        self._connection.close()
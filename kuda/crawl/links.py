@@ -0,0 +1,46 @@
+import csv
+import json
+from ast import literal_eval
+from typing import List
+
+# Columns we look for links in, the link CSVs use "Links"
+LINK_COLUMNS: List[str] = ["Links", "links", "link", "url"]
+
+
+def _csv_links(path: str) -> List[str]:
+    links: List[str] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        column = next(
+            (c for c in LINK_COLUMNS if c in (reader.fieldnames or [])), None
+        )
+        if column is None:
+            raise ValueError(f"No link column found in '{path}'")
+        for row in reader:
+            value = (row[column] or "").strip()
+            if not value:
+                continue
+            # The scraped link CSVs store a list of links per user
+            if value.startswith("["):
+                links.extend(literal_eval(value))
+            else:
+                links.append(value)
+    return links
+
+
+def read_links(path: str) -> List[str]:
+    """
+    Reads workout links from a CSV (a "Links" column like the
+    workout link data), a JSON list or a text file with one link
+    per line. Duplicates are dropped, keeping the first occurrence.
+    """
+
+    if path.endswith(".csv"):
+        links = _csv_links(path)
+    elif path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            links = json.loads(f.read())
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            links = [line.strip() for line in f if line.strip()]
+    return list(dict.fromkeys(links))
@@ -0,0 +1,246 @@
+# The crawl options are threaded through every stage
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+# pylint: disable=too-many-locals
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import nullcontext
+from itertools import takewhile
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from kuda.crawl.dead_letter import FETCH_STAGE, DeadLetterStore, parse_page
+from kuda.crawl.dedup import ParseCache
+from kuda.crawl.progress import CrawlProgress
+from kuda.crawl.queue import Heartbeat, WorkQueue
+from kuda.crawl.sinks import WorkoutSink
+from kuda.scrapers.workout.scraper import (
+    Workout,
+    fetch_workout_page,
+    parse_workout,
+)
+
+
+def _fetch_and_parse(
+    url: str,
+    dead_letters: DeadLetterStore,
+    fetch: Callable[[str], str],
+    parse: Callable[[str, str], Workout],
+    parse_pool: Optional[Executor],
+    parse_cache: Optional[ParseCache],
+) -> Tuple[Optional[Workout], bool, bool]:
+    # Returns the workout (None on failure), whether it was cached
+    # and whether the page was fetched
+    try:
+        html = fetch(url)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        dead_letters.add(url, e, stage=FETCH_STAGE)
+        return None, False, False
+
+    key = None
+    if parse_cache is not None:
+        try:
+            key = parse_cache.key(html)
+            workout = parse_cache.get(key, url)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Not a page we can hash (the parser will dead letter it)
+            # or the cache is unavailable, either way it's parsed
+            key = None
+        else:
+            if workout is not None:
+                return workout, True, True
+
+    if parse_pool is None:
+        workout = parse_page(url, html, dead_letters, parse=parse)
+    else:
+        # Parsing is CPU bound so it's handed to a process,
+        # this thread just waits for the result
+        workout = parse_pool.submit(
+            parse_page, url, html, dead_letters, parse=parse
+        ).result()
+
+    if parse_cache is not None and key is not None and workout is not None:
+        try:
+            parse_cache.put(key, workout)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # The page is just parsed again next time
+            pass
+    return workout, False, True
+
+
+def _crawl_pages(
+    urls: Iterable[str],
+    dead_letters: DeadLetterStore,
+    fetch_workers: int,
+    parse_processes: int,
+    fetch: Callable[[str], str],
+    parse: Callable[[str, str], Workout],
+    parse_cache: Optional[ParseCache],
+) -> Iterator[Tuple[str, Optional[Workout], bool, bool]]:
+    # Yields (url, workout or None on failure, cached, fetched)
+    # as pages complete, removing the dead letters of the pages that
+    # succeed once the caller is done with them
+    max_in_flight = fetch_workers * 2
+    urls = iter(urls)
+
+    parse_context = (
+        ProcessPoolExecutor(parse_processes)
+        if parse_processes > 0
+        else nullcontext()
+    )
+    with ThreadPoolExecutor(
+        fetch_workers
+    ) as fetch_pool, parse_context as parse_pool:
+        in_flight: Dict[Future, str] = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                url = next(urls, None)
+                if url is None:
+                    exhausted = True
+                    break
+                future = fetch_pool.submit(
+                    _fetch_and_parse,
+                    url,
+                    dead_letters,
+                    fetch,
+                    parse,
+                    parse_pool,
+                    parse_cache,
+                )
+                in_flight[future] = url
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                workout, cached, fetched = future.result()
+                url = in_flight.pop(future)
+                yield url, workout, cached, fetched
+                if workout is not None:
+                    # The caller has written the workout, a dead letter
+                    # from an earlier failed crawl is out of date
+                    dead_letters.remove(url)
+
+
+def crawl(
+    urls: Iterable[str],
+    sink: WorkoutSink,
+    dead_letters: DeadLetterStore,
+    fetch_workers: int = 8,
+    parse_processes: int = 0,
+    progress: Optional[CrawlProgress] = None,
+    fetch: Callable[[str], str] = fetch_workout_page,
+    parse: Callable[[str, str], Workout] = parse_workout,
+    parse_cache: Optional[ParseCache] = None,
+) -> CrawlProgress:
+    """
+    Fetches pages on `fetch_workers` threads and parses them in
+    `parse_processes` processes (in the fetching thread if 0),
+    writing workouts to the sink as they complete. Failed pages go
+    to the dead letter store, the dead letters of pages that now
+    succeed are removed. At most 2 x fetch_workers pages are in
+    flight so memory stays flat however many urls there are.
+    Pages whose workout panel is in the parse cache aren't parsed.
+
+    `parse` must be picklable (a module level function)
+    when parse_processes > 0.
+    """
+
+    progress = progress or CrawlProgress()
+    for _, workout, cached, _ in _crawl_pages(
+        urls,
+        dead_letters,
+        fetch_workers,
+        parse_processes,
+        fetch,
+        parse,
+        parse_cache,
+    ):
+        if workout is not None:
+            sink.write(workout)
+        progress.update(failed=workout is None, cached=cached)
+    return progress
+
+
+def crawl_queue(
+    queue: WorkQueue,
+    worker: str,
+    sink: WorkoutSink,
+    dead_letters: DeadLetterStore,
+    batch_size: int = 100,
+    fetch_workers: int = 8,
+    parse_processes: int = 0,
+    progress: Optional[CrawlProgress] = None,
+    fetch: Callable[[str], str] = fetch_workout_page,
+    parse: Callable[[str, str], Workout] = parse_workout,
+    parse_cache: Optional[ParseCache] = None,
+) -> CrawlProgress:
+    """
+    Leases batches of links from the work queue and crawls them until
+    the queue has nothing left to lease. Leases are heartbeated while
+    a batch is crawled and the crawled links completed once they're
+    written, pages that fail to parse are completed too as they're in
+    the dead letter store. Pages that fail to fetch (e.g. 429s) go
+    back to the queue until they've used up the queue's attempts.
+    If a lease is lost to another worker the batch is stopped and the
+    links not yet crawled are released.
+    If the crawl is interrupted the batch is released for another
+    worker, so pages may be written more than once but never dropped.
+    """
+
+    progress = progress or CrawlProgress()
+    while True:
+        urls = queue.lease(worker, batch_size)
+        if not urls:
+            return progress
+        crawled: List[str] = []
+        unfetched: List[str] = []
+        with Heartbeat(
+            queue, worker, queue.lease_seconds / 3, leases=len(urls)
+        ) as heartbeat:
+            try:
+                for url, workout, cached, fetched in _crawl_pages(
+                    # Stop taking links once a lease has been lost
+                    takewhile(lambda _: not heartbeat.lost.is_set(), urls),
+                    dead_letters,
+                    fetch_workers,
+                    parse_processes,
+                    fetch,
+                    parse,
+                    parse_cache,
+                ):
+                    if workout is not None:
+                        sink.write(workout)
+                    if fetched:
+                        progress.update(failed=workout is None, cached=cached)
+                        crawled.append(url)
+                    else:
+                        unfetched.append(url)
+                # The workouts must be durable before their links are
+                # completed, otherwise a host dying loses them
+                sink.flush()
+            except BaseException:
+                queue.release(worker, urls)
+                raise
+        queue.complete(worker, crawled)
+        # Fetch failures only count once they've used up their attempts
+        for _ in range(queue.retry(worker, unfetched)):
+            progress.update(failed=True)
+        queue.release(
+            worker,
+            [url for url in urls if url not in crawled + unfetched],
+        )
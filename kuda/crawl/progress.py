@@ -0,0 +1,114 @@
+import sys
+import time
+from datetime import timedelta
+from typing import Optional, TextIO
+
+
+class CrawlProgress:  # pylint: disable=too-many-instance-attributes
+    """
+    Tracks pages done and failed, reporting pages/sec,
+    error rate and ETA to a stream at most every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        stream: TextIO = sys.stderr,
+        interval: float = 1.0,
+        track_cache: bool = False,
+    ):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.cached = 0
+        self.track_cache = track_cache
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds since the crawl started.
+        """
+
+        return time.monotonic() - self.started
+
+    @property
+    def pages_per_second(self) -> float:
+        """
+        Pages done per second since the start.
+        """
+
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """
+        Fraction of the pages done that failed.
+        """
+
+        return self.failed / self.done if self.done else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """
+        Fraction of the pages done served by the parse cache.
+        """
+
+        return self.cached / self.done if self.done else 0.0
+
+    @property
+    def eta(self) -> Optional[timedelta]:
+        """
+        Time left at the current rate, None without a total.
+        """
+
+        if self.total is None or not self.pages_per_second:
+            return None
+        remaining = max(self.total - self.done, 0)
+        return timedelta(seconds=round(remaining / self.pages_per_second))
+
+    def update(self, failed: bool = False, cached: bool = False) -> None:
+        """
+        Counts a page, reporting if `interval` has passed.
+        """
+
+        self.done += 1
+        if failed:
+            self.failed += 1
+        if cached:
+            self.cached += 1
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(end="\r")
+
+    def render(self) -> str:
+        """
+        The progress line, e.g. "120/500 pages 8.0 pages/s ...".
+        """
+
+        total = f"/{self.total}" if self.total is not None else ""
+        eta = self.eta
+        return (
+            f"{self.done}{total} pages "
+            f"{self.pages_per_second:.1f} pages/s "
+            f"{self.error_rate:.1%} errors"
+            + (
+                f" {self.cache_hit_rate:.1%} cache hits"
+                if self.track_cache
+                else ""
+            )
+            + (f" ETA {eta}" if eta is not None else "")
+        )
+
+    def report(self, end: str = "\n") -> None:
+        """
+        Writes the progress line to the stream.
+        """
+
+        self.stream.write(self.render() + end)
+        self.stream.flush()
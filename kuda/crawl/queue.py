@@ -0,0 +1,285 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List
+
+PENDING: str = "pending"
+LEASED: str = "leased"
+DONE: str = "done"
+FAILED: str = "failed"
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS links (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS links_status ON links (status, lease_expires);
+"""
+
+
+def default_worker_id() -> str:
+    """
+    Worker id unique to this process, "<hostname>-<pid>".
+    """
+
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Lease based work queue of workout links in a SQLite database,
+    which can sit on a path shared by the crawl hosts.
+
+    Workers lease batches of links, heartbeat to keep their leases
+    and complete them when done. Leases that expire (a worker died or
+    stalled) are handed out again, links leased `max_attempts` times
+    without completing are marked failed so a page that kills workers
+    can't stall the crawl.
+
+    The rollback journal is used rather than WAL
+    as WAL doesn't work over network filesystems.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 300,
+        max_attempts: int = 3,
+        timeout: float = 60,
+        now: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        # Clock used for leases, swappable in tests
+        self.now = now
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # A connection per call so the queue can be used across threads
+        connection = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None
+        )
+        try:
+            # Take the write lock up front so two workers
+            # can't select the same links
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def enqueue(self, urls: Iterable[str]) -> int:
+        """
+        Adds links to the queue, links already queued are ignored.
+        Returns the number of links added.
+        """
+
+        now = self.now()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO links (url, updated_at) VALUES (?, ?)",
+                ((url, now) for url in urls),
+            )
+            return connection.total_changes - before
+
+    def lease(self, worker: str, batch_size: int) -> List[str]:
+        """
+        Leases up to batch_size pending or expired links to the worker.
+        """
+
+        now = self.now()
+        with self._transaction() as connection:
+            # Expired leases that have used up their attempts are failed
+            connection.execute(
+                "UPDATE links SET status = ?, worker = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            urls = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT url FROM links WHERE status = ? "
+                    "OR (status = ? AND lease_expires < ?) LIMIT ?",
+                    (PENDING, LEASED, now, batch_size),
+                )
+            ]
+            connection.executemany(
+                "UPDATE links SET status = ?, worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE url = ?",
+                (
+                    (LEASED, worker, now + self.lease_seconds, now, url)
+                    for url in urls
+                ),
+            )
+        return urls
+
+    def heartbeat(self, worker: str) -> int:
+        """
+        Extends all the worker's leases.
+        Returns the number of leases the worker still holds.
+        """
+
+        now = self.now()
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE links SET lease_expires = ?, updated_at = ? "
+                "WHERE status = ? AND worker = ?",
+                (now + self.lease_seconds, now, LEASED, worker),
+            ).rowcount
+
+    def _finish(self, worker: str, urls: Iterable[str], status: str) -> int:
+        now = self.now()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            # Only links the worker still holds, a link whose lease
+            # expired may have been leased to another worker since
+            connection.executemany(
+                "UPDATE links SET status = ?, worker = NULL, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE url = ? AND status = ? AND worker = ?",
+                ((status, now, url, LEASED, worker) for url in urls),
+            )
+            return connection.total_changes - before
+
+    def complete(self, worker: str, urls: Iterable[str]) -> int:
+        """
+        Marks the worker's leased links done.
+        Returns the number of links that were still the worker's.
+        """
+
+        return self._finish(worker, urls, DONE)
+
+    def fail(self, worker: str, urls: Iterable[str]) -> int:
+        """
+        Marks the worker's leased links failed for good.
+        Returns the number of links that were still the worker's.
+        """
+
+        return self._finish(worker, urls, FAILED)
+
+    def retry(self, worker: str, urls: Iterable[str]) -> int:
+        """
+        Hands the worker's leased links back to the queue to be tried
+        again, links that have used up their attempts are failed.
+        Returns the number of links failed.
+        """
+
+        urls = list(urls)
+        now = self.now()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "UPDATE links SET status = ?, worker = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE url = ? "
+                "AND status = ? AND worker = ? AND attempts >= ?",
+                (
+                    (FAILED, now, url, LEASED, worker, self.max_attempts)
+                    for url in urls
+                ),
+            )
+            failed = connection.total_changes - before
+            connection.executemany(
+                "UPDATE links SET status = ?, worker = NULL, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE url = ? AND status = ? AND worker = ?",
+                ((PENDING, now, url, LEASED, worker) for url in urls),
+            )
+            return failed
+
+    def release(self, worker: str, urls: Iterable[str]) -> int:
+        """
+        Hands the worker's leased links back to the queue
+        without using an attempt.
+        """
+
+        now = self.now()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "UPDATE links SET status = ?, worker = NULL, "
+                "lease_expires = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated_at = ? WHERE url = ? AND status = ? AND worker = ?",
+                ((PENDING, now, url, LEASED, worker) for url in urls),
+            )
+            return connection.total_changes - before
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of links per status, expired leases count as pending.
+        """
+
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._transaction() as connection:
+            for status, count in connection.execute(
+                "SELECT CASE WHEN status = ? AND lease_expires < ? "
+                "THEN ? ELSE status END, COUNT(*) FROM links GROUP BY 1",
+                (LEASED, self.now(), PENDING),
+            ):
+                counts[status] = count
+        return counts
+
+
+class Heartbeat:
+    """
+    Background thread heartbeating a worker's leases
+    every `interval` seconds while in use as a context manager.
+
+    `lost` is set once the worker holds fewer than `leases` links,
+    i.e. a lease expired and the link was handed to another worker,
+    so the batch should be stopped. A failed heartbeat (e.g. the
+    database stayed locked past the busy timeout) is tried again next
+    interval, `lost` is set if the leases expire in the meantime.
+    """
+
+    def __init__(
+        self, queue: WorkQueue, worker: str, interval: float, leases: int
+    ):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval
+        self.leases = leases
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        # The leases were taken just before the heartbeat started
+        expires = self.queue.now() + self.queue.lease_seconds
+        while not self._stop.wait(self.interval):
+            now = self.queue.now()
+            try:
+                held = self.queue.heartbeat(self.worker)
+            except Exception:  # pylint: disable=broad-exception-caught
+                if now >= expires:
+                    self.lost.set()
+                continue
+            expires = now + self.queue.lease_seconds
+            if held < self.leases:
+                self.lost.set()
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._stop.set()
+        self._thread.join()
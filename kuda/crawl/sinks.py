@@ -0,0 +1,164 @@
+import json
+import os
+from typing import Iterable, List, Protocol, TextIO
+
+from kuda.scrapers.workout.scraper import (
+    Workout,
+    WorkoutComponent,
+    get_workout_id,
+)
+
+
+def write_workout_stream(
+    workout: Workout,
+    workout_components: Iterable[WorkoutComponent],
+    file: TextIO,
+) -> None:
+    """
+    Writes a workout as JSON, writing its workout components one at a
+    time as the iterator (e.g. from `stream_workout`) yields them.
+    If the iterator raises, whatever was written of the workout is
+    left in the file.
+    """
+
+    head = json.dumps(workout)[:-1]
+    file.write(head + (", " if workout else "") + '"workout_components": [')
+    for index, workout_component in enumerate(workout_components):
+        file.write((", " if index else "") + json.dumps(workout_component))
+    file.write("]}")
+
+
+class WorkoutSink(Protocol):
+    """
+    Where crawled workouts are written.
+    """
+
+    def write(self, workout: Workout) -> None:
+        """
+        Writes one workout.
+        """
+
+    def flush(self) -> None:
+        """
+        Makes everything written so far durable, e.g. before
+        the links are completed in the work queue.
+        """
+
+    def close(self) -> None:
+        """
+        Closes the sink, it isn't written to again.
+        """
+
+
+class JsonLinesSink:
+    """
+    Appends one workout per line to a .jsonl file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Kept open for the life of the sink, see close
+        self._file = open(  # pylint: disable=consider-using-with
+            path, "a", encoding="utf-8"
+        )
+
+    def write(self, workout: Workout) -> None:
+        """
+        Appends the workout as one line.
+        """
+
+        self._file.write(json.dumps(workout) + "\n")
+
+    def write_stream(
+        self,
+        workout: Workout,
+        workout_components: Iterable[WorkoutComponent],
+    ) -> None:
+        """
+        Writes a workout as its components are parsed. If parsing
+        fails the partly written line is truncated away, so a bad
+        page never corrupts the next line.
+        """
+
+        self._file.flush()
+        start = self._file.tell()
+        try:
+            write_workout_stream(workout, workout_components, self._file)
+            self._file.write("\n")
+        except BaseException:
+            self._file.flush()
+            self._file.truncate(start)
+            self._file.seek(start)
+            raise
+
+    def flush(self) -> None:
+        """
+        Flushes and fsyncs the file.
+        """
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """
+        Closes the file.
+        """
+
+        self._file.close()
+
+
+class JsonDirectorySink:
+    """
+    Writes each workout to `<workout id>.json` in a directory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # Files written since the last flush
+        self._unflushed: List[str] = []
+
+    def write(self, workout: Workout) -> None:
+        """
+        Writes the workout to its own file, replacing any earlier copy.
+        """
+
+        file_path = os.path.join(
+            self.path, f"{get_workout_id(workout['url'])}.json"
+        )
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(workout, indent=4))
+        self._unflushed.append(file_path)
+
+    def flush(self) -> None:
+        """
+        Fsyncs the files written since the last flush and the directory.
+        """
+
+        # Syncing once per flush rather than per file, the directory
+        # is synced too so the new file names are durable
+        for file_path in self._unflushed + [self.path]:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._unflushed = []
+
+    def close(self) -> None:
+        """
+        Forgets the unflushed files, nothing is held open.
+        """
+
+        self._unflushed = []
+
+
+def open_sink(path: str) -> WorkoutSink:
+    """
+    A JSON lines sink for paths ending in .jsonl,
+    otherwise a directory of JSON files.
+    """
+
+    if path.endswith(".jsonl"):
+        return JsonLinesSink(path)
+    return JsonDirectorySink(path)
@@ -1 +1,9 @@
-from kuda.scrapers.workout.scraper import scrape_workout
+from kuda.scrapers.workout.scraper import (
+    fetch_workout_page,
+    iter_set_component_rows,
+    parse_workout,
+    parse_workout_summary,
+    scrape_workout,
+    scrape_workout_summary,
+    stream_workout,
+)
@@ -2,12 +2,21 @@
 # mypy: ignore-errors
 
 import re
+import threading
 from enum import Enum
 from itertools import cycle
-from typing import Dict, List, Optional, Tuple, TypedDict
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    NotRequired,
+    Optional,
+    Tuple,
+    TypedDict,
+)
 
 import requests
-from bs4 import BeautifulSoup, element
+from bs4 import BeautifulSoup, SoupStrainer, element
 
 
 class BBSetType(Enum):
@@ -59,12 +68,27 @@ class Workout(TypedDict):
     duration: str
     cardio_duration: str
     rating: str
-    workout_components: List[WorkoutComponent]
+    energy_level: int
+    self_rating: str
+    # Not parsed by the summary only parser
+    workout_components: NotRequired[List[WorkoutComponent]]
     username: str
+    url: str
 
 
+# Salts the parse cache keys (kuda.crawl.ParseCache). Bump it with any
+# change to what parse_workout or parse_workout_summary return, or
+# cached results of the old parser keep being served
+PARSER_VERSION = "1"
+
 request_agent = "Mozilla/5.0 Chrome/47.0.2526.106 Safari/537.36"
 
+# Seconds to wait to connect and between bytes of the response
+request_timeout = 30
+
+# A session per thread so fetch threads reuse their connections
+_sessions = threading.local()
+
 
 def get_rest_time(string: str) -> str:
     if string is None:
@@ -298,11 +322,52 @@ def find_rest_for_set_component(
             return get_rest_time(div.text)
 
 
-def scrape_workout(url: str) -> Dict[str, str]:
+def get_workout_id(url: str) -> str:
+    # The workout uuid at the end of a workout log link
+    return url.rstrip("/").split("/")[-1]
+
+
+def get_session() -> requests.Session:
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+        _sessions.session.headers["User-Agent"] = request_agent
+    return _sessions.session
+
+
+def fetch_workout_page(url: str, timeout: float = request_timeout) -> str:
+    response = get_session().get(url, timeout=timeout)
+    # Error pages (429s, 5xxs) are fetch failures, not workouts
+    response.raise_for_status()
+    return response.text
+
+
+def scrape_workout(url: str) -> Workout:
+    return parse_workout(url, fetch_workout_page(url))
+
+
+SUMMARY_CLASSES = {"rowSectionHeader", "musclesWorked", "workout-footer"}
+SUMMARY_WICKETPATHS = {
+    "logResultsPanel_workoutSummary_totalWorkoutTime",
+    "logResultsPanel_workoutSummary_totalCardioTime",
+}
+
+
+def is_summary_tag(name: str, attrs: Dict[str, str]) -> bool:
+    # Only the summary tags (and their children) are built into the
+    # tree when parsing with summary_strainer
+    if attrs.get("wicketpath") in SUMMARY_WICKETPATHS:
+        return True
+    classes = attrs.get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    return not SUMMARY_CLASSES.isdisjoint(classes.split())
+
+
+summary_strainer = SoupStrainer(is_summary_tag)
+
+
+def get_workout_summary(html_page: element.Tag, url: str) -> Workout:
     username = url.split("viewworkoutlog")[1].split("/")[1]
-    html_page: element.Tag = BeautifulSoup(
-        requests.get(url, headers={"User-Agent": request_agent}).text, "lxml"
-    )
     workout: Workout = dict()
 
     # Get the Workout Name
@@ -341,7 +406,63 @@ def scrape_workout(url: str) -> Dict[str, str]:
     workout["energy_level"] = get_energy_level(workout_footer)
     rating = workout_footer.find("span", {"class": "bigRating"}).text.strip()
     workout["self_rating"] = rating
+    return workout
+
+
+def parse_workout_summary(url: str, html: str) -> Workout:
+    # The header fields only, the exercise sections are never built
+    html_page: element.Tag = BeautifulSoup(
+        html, "lxml", parse_only=summary_strainer
+    )
+    return get_workout_summary(html_page, url)
+
+
+def scrape_workout_summary(url: str) -> Workout:
+    return parse_workout_summary(url, fetch_workout_page(url))
+
 
+def parse_workout(url: str, html: str) -> Workout:
+    html_page: element.Tag = BeautifulSoup(html, "lxml")
+    workout: Workout = get_workout_summary(html_page, url)
+    workout["workout_components"] = list(iter_workout_components(html_page))
+    return workout
+
+
+def stream_workout(
+    url: str, html: str
+) -> Tuple[Workout, Iterator[WorkoutComponent]]:
+    # The summary now and the workout components lazily, so they can be
+    # written out as they're parsed
+    html_page: element.Tag = BeautifulSoup(html, "lxml")
+    workout: Workout = get_workout_summary(html_page, url)
+    return workout, iter_workout_components(html_page)
+
+
+def iter_set_component_rows(url: str, html: str) -> Iterator[Dict[str, str]]:
+    # One flat row per set component, with its set and workout component
+    workout, workout_components = stream_workout(url, html)
+    for workout_component in workout_components:
+        for set_ in workout_component["sets"]:
+            for set_component in set_["set_components"]:
+                yield {
+                    "url": url,
+                    "username": workout["username"],
+                    "workout_component_sequence": workout_component[
+                        "sequence"
+                    ],
+                    "workout_component_rest_time": workout_component[
+                        "rest_time"
+                    ],
+                    "set_sequence": set_["sequence"],
+                    "set_type": set_["type"],
+                    "set_rest_time": set_.get("rest_time"),
+                    **set_component,
+                }
+
+
+def iter_workout_components(
+    html_page: element.Tag,
+) -> Iterator[WorkoutComponent]:
     # From exercise overiew we want the Name and Link to the exercise page.
     exercise_overview: List[element.Tag] = html_page.findAll(
         "div", {"class": "exercise-overview"}
@@ -359,8 +480,13 @@ def scrape_workout(url: str) -> Dict[str, str]:
     # The exercise BB.com details/overview sections are our Workout Components
     number_workout_components: int = len(exercise_overview)
 
-    workout["workout_components"]: List[WorkoutComponent] = []
     for workout_component_index in range(number_workout_components):
+        # The previous component has been yielded, drop its tags from
+        # the soup so long workouts don't hold the whole page
+        if workout_component_index > 0:
+            exercise_overview[workout_component_index - 1].decompose()
+            exercise_details[workout_component_index - 1].decompose()
+
         workout_component: WorkoutComponent = WorkoutComponent()
         workout_component["sequence"]: int = workout_component_index + 1
         workout_component["sets"]: List[Set] = []
@@ -621,5 +747,4 @@ def scrape_workout(url: str) -> Dict[str, str]:
                 set_["set_components"].append(set_component)
                 set_["rest_time"] = set_component["rest_time"]
             workout_component["sets"].append(set_)
-        workout["workout_components"].append(workout_component)
-    return workout
+        yield workout_component
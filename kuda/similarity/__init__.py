@@ -0,0 +1,2 @@
+from kuda.similarity.ann import WorkoutIndex, embed_workout, embed_workouts
+from kuda.similarity.minhash import near_duplicate_clusters
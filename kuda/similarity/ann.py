@@ -0,0 +1,395 @@
+import json
+import os
+import zlib
+from itertools import islice
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Sized,
+    Tuple,
+)
+
+import numpy as np
+
+from kuda.scrapers.workout.scraper import Workout
+
+# The muscle groups BB.com tags workouts and exercises with
+MUSCLES: List[str] = [
+    "Abdominals",
+    "Abductors",
+    "Adductors",
+    "Biceps",
+    "Calves",
+    "Chest",
+    "Forearms",
+    "Glutes",
+    "Hamstrings",
+    "Lats",
+    "Lower Back",
+    "Middle Back",
+    "Neck",
+    "Quadriceps",
+    "Shoulders",
+    "Traps",
+    "Triceps",
+]
+MUSCLE_INDEX: Dict[str, int] = {m: i for i, m in enumerate(MUSCLES)}
+
+# Exercise names are an open vocabulary so they are hashed into buckets
+EXERCISE_BUCKETS: int = 64
+
+# muscles | exercise mix | duration, energy_level, self_rating
+EMBEDDING_SIZE: int = len(MUSCLES) + EXERCISE_BUCKETS + 3
+
+# Rows embedded and hashed at a time when building an index, bounding
+# the (n_tables, rows, n_bits) hashing intermediates
+CHUNK_SIZE: int = 65536
+
+INDEX_FILES: Tuple[str, ...] = (
+    "vectors.npy",
+    "planes.npy",
+    "codes.npy",
+    "order.npy",
+    "ids.json",
+)
+
+
+def exercise_bucket(exercise_name: str) -> int:
+    """
+    Stable bucket for an exercise name, shared across processes.
+    """
+
+    name = exercise_name.strip().lower().encode("utf-8")
+    return zlib.crc32(name) % EXERCISE_BUCKETS
+
+
+def embed_workouts(  # pylint: disable=too-many-locals
+    workouts: Iterable[Workout],
+) -> np.ndarray:
+    """
+    Embeds a batch of workouts into an (n, EMBEDDING_SIZE) float32 array.
+
+    The muscle and exercise blocks are L2 normalised separately so a
+    long workout doesn't drown out the summary features.
+    """
+
+    rows: List[int] = []
+    cols: List[int] = []
+    values: List[float] = []
+    numeric: List[Tuple[float, float, float]] = []
+
+    for row, workout in enumerate(workouts):
+        for muscle in workout.get("muscles_used") or []:
+            if muscle in MUSCLE_INDEX:
+                rows.append(row)
+                cols.append(MUSCLE_INDEX[muscle])
+                values.append(1.0)
+
+        # Exercise mix weighted by how many sets each exercise appears in
+        for workout_component in workout.get("workout_components") or []:
+            for set_ in workout_component["sets"]:
+                for set_component in set_["set_components"]:
+                    rows.append(row)
+                    cols.append(
+                        len(MUSCLES)
+                        + exercise_bucket(set_component["exercise_name"])
+                    )
+                    values.append(1.0)
+
+        numeric.append(
+            (
+                float(workout.get("duration") or 0),
+                float(workout.get("energy_level") or 0),
+                float(workout.get("self_rating") or 0),
+            )
+        )
+
+    vectors = np.zeros((len(numeric), EMBEDDING_SIZE), dtype=np.float32)
+    if not numeric:
+        return vectors
+    np.add.at(
+        vectors,
+        (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)),
+        values,
+    )
+
+    for start, stop in (
+        (0, len(MUSCLES)),
+        (len(MUSCLES), len(MUSCLES) + EXERCISE_BUCKETS),
+    ):
+        block = vectors[:, start:stop]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        np.divide(block, norms, out=block, where=norms > 0)
+
+    numeric_array = np.array(numeric, dtype=np.float32)
+    # Duration in seconds is log scaled, energy level is 1-4, rating 0-10
+    vectors[:, -3] = np.log1p(numeric_array[:, 0]) / np.log1p(4 * 3600)
+    vectors[:, -2] = numeric_array[:, 1] / 4
+    vectors[:, -1] = numeric_array[:, 2] / 10
+    return vectors
+
+
+def embed_workout(workout: Workout) -> np.ndarray:
+    """
+    Embeds a single workout, see `embed_workouts`.
+    """
+
+    return embed_workouts([workout])[0]
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(
+        vectors, norms, out=np.zeros_like(vectors), where=norms > 0
+    )
+
+
+def _hash_codes(vectors: np.ndarray, planes: np.ndarray) -> np.ndarray:
+    """
+    Random hyperplane hash of each vector for every table.
+    Returns an (n_tables, n) uint64 array of packed sign bits.
+    """
+
+    n_bits = planes.shape[2]
+    weights = np.left_shift(np.uint64(1), np.arange(n_bits, dtype=np.uint64))
+    # (n_tables, n, n_bits)
+    bits = np.einsum("nd,tdb->tnb", vectors, planes) > 0
+    return (bits.astype(np.uint64) * weights).sum(axis=2, dtype=np.uint64)
+
+
+def _random_planes(
+    n_tables: int, n_dims: int, n_bits: int, seed: int
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n_tables, n_dims, n_bits)).astype(np.float32)
+
+
+def _chunks(
+    workouts: Iterable[Workout], chunk_size: int
+) -> Iterable[List[Workout]]:
+    workouts = iter(workouts)
+    while chunk := list(islice(workouts, chunk_size)):
+        yield chunk
+
+
+def _embed_sized(
+    workouts: Iterable[Workout], n: int, planes: np.ndarray, chunk_size: int
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    # (vectors, codes, ids) of n workouts, embedded and hashed
+    # a chunk at a time into preallocated arrays
+    vectors = np.empty((n, EMBEDDING_SIZE), dtype=np.float32)
+    codes = np.empty((planes.shape[0], n), dtype=np.uint64)
+    ids: List[str] = []
+    for chunk in _chunks(workouts, chunk_size):
+        start, stop = len(ids), len(ids) + len(chunk)
+        vectors[start:stop] = _normalise(embed_workouts(chunk))
+        codes[:, start:stop] = _hash_codes(vectors[start:stop], planes)
+        ids.extend(workout["url"] for workout in chunk)
+    return vectors, codes, ids
+
+
+def _embed_stream(
+    workouts: Iterable[Workout], planes: np.ndarray, chunk_size: int
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    # (vectors, codes, ids) of workouts of unknown number, the
+    # chunks are joined at the end
+    vector_chunks = [np.empty((0, EMBEDDING_SIZE), dtype=np.float32)]
+    code_chunks = [np.empty((planes.shape[0], 0), dtype=np.uint64)]
+    ids: List[str] = []
+    for chunk in _chunks(workouts, chunk_size):
+        vector_chunks.append(_normalise(embed_workouts(chunk)))
+        code_chunks.append(_hash_codes(vector_chunks[-1], planes))
+        ids.extend(workout["url"] for workout in chunk)
+    return (
+        np.concatenate(vector_chunks),
+        np.concatenate(code_chunks, axis=1),
+        ids,
+    )
+
+
+class WorkoutIndex:
+    """
+    Approximate nearest neighbour index over workout embeddings using
+    random projection LSH (cosine similarity).
+
+    Each of the `n_tables` tables hashes a vector to an `n_bits` code,
+    codes are kept sorted so a bucket lookup is a binary search.
+    Candidates from all tables are re-ranked by exact cosine similarity.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        planes: np.ndarray,
+        codes: np.ndarray,
+        order: np.ndarray,
+    ):
+        self.vectors = vectors
+        self.ids = ids
+        self.planes = planes
+        # Per table, codes[t] is sorted and order[t] maps back to rows
+        self.codes = codes
+        self.order = order
+
+    @classmethod
+    def _sorted(
+        cls,
+        vectors: np.ndarray,
+        ids: List[str],
+        planes: np.ndarray,
+        codes: np.ndarray,
+    ) -> "WorkoutIndex":
+        order = np.argsort(codes, axis=1, kind="stable")
+        codes = np.take_along_axis(codes, order, axis=1)
+        return cls(vectors, ids, planes, codes, order)
+
+    @classmethod
+    def build(
+        cls,
+        workouts: Iterable[Workout],
+        n_tables: int = 8,
+        n_bits: int = 16,
+        seed: int = 0,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> "WorkoutIndex":
+        """
+        Embeds and indexes the workouts, using their url as the id.
+
+        Workouts are embedded and hashed `chunk_size` at a time so
+        only a chunk of them (and of the hashing intermediates) is
+        held at once, `workouts` can be a generator.
+        """
+
+        if not 0 < n_bits <= 64:
+            raise ValueError("n_bits must be between 1 and 64")
+        planes = _random_planes(n_tables, EMBEDDING_SIZE, n_bits, seed)
+
+        # Chunks are written straight into the arrays when the number
+        # of workouts is known, otherwise they're joined at the end
+        if isinstance(workouts, Sized):
+            vectors, codes, ids = _embed_sized(
+                workouts, len(workouts), planes, chunk_size
+            )
+        else:
+            vectors, codes, ids = _embed_stream(workouts, planes, chunk_size)
+        return cls._sorted(vectors, ids, planes, codes)
+
+    @classmethod
+    def from_vectors(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        cls,
+        vectors: np.ndarray,
+        ids: List[str],
+        n_tables: int = 8,
+        n_bits: int = 16,
+        seed: int = 0,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> "WorkoutIndex":
+        """
+        Indexes already embedded vectors, normalising and hashing
+        them `chunk_size` rows at a time into preallocated arrays.
+        """
+
+        if len(ids) != len(vectors):
+            raise ValueError("Number of ids and vectors don't match")
+        if not 0 < n_bits <= 64:
+            raise ValueError("n_bits must be between 1 and 64")
+
+        n, n_dims = vectors.shape
+        planes = _random_planes(n_tables, n_dims, n_bits, seed)
+        normalised = np.empty((n, n_dims), dtype=np.float32)
+        codes = np.empty((n_tables, n), dtype=np.uint64)
+        for start in range(0, n, chunk_size):
+            stop = start + chunk_size
+            normalised[start:stop] = _normalise(
+                np.asarray(vectors[start:stop], dtype=np.float32)
+            )
+            codes[:, start:stop] = _hash_codes(normalised[start:stop], planes)
+        return cls._sorted(normalised, list(ids), planes, codes)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _candidates(self, codes: np.ndarray) -> np.ndarray:
+        candidates = []
+        for table, code in enumerate(codes):
+            sorted_codes = self.codes[table]
+            start = np.searchsorted(sorted_codes, code, side="left")
+            stop = np.searchsorted(sorted_codes, code, side="right")
+            candidates.append(self.order[table, start:stop])
+        return np.unique(np.concatenate(candidates))
+
+    def query_vector(
+        self, vector: np.ndarray, k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (id, cosine similarity) pairs, most similar first.
+        """
+
+        vector = _normalise(np.asarray(vector, dtype=np.float32))
+        codes = _hash_codes(vector[np.newaxis, :], self.planes)[:, 0]
+        candidates = self._candidates(codes)
+
+        # Probe the neighbouring buckets (one bit flipped) if the exact
+        # buckets don't give us enough candidates
+        if len(candidates) < k:
+            n_bits = self.planes.shape[2]
+            probes = [candidates]
+            for bit in range(n_bits):
+                flipped = codes ^ np.left_shift(np.uint64(1), np.uint64(bit))
+                probes.append(self._candidates(flipped))
+            candidates = np.unique(np.concatenate(probes))
+
+        if len(candidates) == 0:
+            return []
+        scores = np.asarray(self.vectors[candidates]) @ vector
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in top]
+
+    def query(self, workout: Workout, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Returns the k most similar indexed workouts as (url, similarity).
+        """
+
+        return self.query_vector(embed_workout(workout), k=k)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index to a directory as .npy files that `load` can
+        memory-map.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "planes.npy"), self.planes)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        np.save(os.path.join(path, "order.npy"), self.order)
+        with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.ids))
+
+    @classmethod
+    def load(
+        cls, path: str, mmap_mode: Optional[Literal["r", "r+", "c"]] = "r"
+    ) -> "WorkoutIndex":
+        """
+        Loads an index saved with `save`, memory-mapping the arrays
+        by default so only the touched pages are read.
+        """
+
+        arrays = {
+            name: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            for name in INDEX_FILES
+            if name.endswith(".npy")
+        }
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            ids = json.loads(f.read())
+        return cls(
+            arrays["vectors.npy"],
+            ids,
+            arrays["planes.npy"],
+            arrays["codes.npy"],
+            arrays["order.npy"],
+        )
@@ -0,0 +1,223 @@
+import zlib
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from kuda.scrapers.workout.scraper import Workout
+
+# Signature value of a workout with no shingles (an empty workout)
+EMPTY: int = np.iinfo(np.uint32).max
+
+
+def workout_tokens(workout: Workout) -> List[str]:
+    """
+    The ordered set sequence of a workout, one token per set made of
+    its type and each set component's exercise and reps.
+    """
+
+    tokens = []
+    for workout_component in workout.get("workout_components") or []:
+        for set_ in workout_component["sets"]:
+            components = ",".join(
+                f"{set_component['exercise_name'].strip().lower()}"
+                f"x{(set_component.get('reps') or '').strip()}"
+                for set_component in set_["set_components"]
+            )
+            tokens.append(f"{set_['type']}:{components}")
+    return tokens
+
+
+def workout_shingles(workout: Workout, k: int = 3) -> np.ndarray:
+    """
+    Unique 32 bit hashes of the k consecutive set token shingles.
+    Workouts with fewer than k sets are a single shingle.
+    """
+
+    tokens = workout_tokens(workout)
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    shingles = [
+        "\n".join(tokens[i : i + k])
+        for i in range(max(len(tokens) - k + 1, 1))
+    ]
+    return np.unique(
+        np.array(
+            [zlib.crc32(s.encode("utf-8")) for s in shingles],
+            dtype=np.uint64,
+        )
+    )
+
+
+def minhash_signatures(  # pylint: disable=too-many-locals
+    shingle_sets: List[np.ndarray],
+    num_perm: int = 128,
+    seed: int = 0,
+    batch_size: int = 1 << 16,
+) -> np.ndarray:
+    """
+    (n, num_perm) uint32 MinHash signatures. Each permutation is a
+    multiply-shift hash, every shingle of a batch of workouts is hashed
+    at once and reduced to per workout minimums with `reduceat`.
+    Batches hold about `batch_size` shingles to bound memory.
+    """
+
+    rng = np.random.default_rng(seed)
+    # Odd multipliers so the multiply-shift hashes are universal
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | 1
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(shingle_sets), num_perm), EMPTY, np.uint32)
+    sizes = np.array([len(s) for s in shingle_sets], dtype=np.int64)
+    # Empty workouts keep the EMPTY signature
+    non_empty = np.flatnonzero(sizes)
+
+    start = 0
+    while start < len(non_empty):
+        # Always take at least one workout per batch
+        stop = start + 1
+        total = sizes[non_empty[start]]
+        while stop < len(non_empty) and (
+            total + sizes[non_empty[stop]] <= batch_size
+        ):
+            total += sizes[non_empty[stop]]
+            stop += 1
+
+        rows = non_empty[start:stop]
+        values = np.concatenate([shingle_sets[row] for row in rows])
+        offsets = np.concatenate(([0], np.cumsum(sizes[rows])[:-1]))
+        hashed = (values[:, np.newaxis] * a + b) >> np.uint64(32)
+        signatures[rows] = np.minimum.reduceat(hashed, offsets, axis=0)
+        start = stop
+    return signatures
+
+
+def _find(parents: np.ndarray, node: int) -> int:
+    root = node
+    while parents[root] != root:
+        root = parents[root]
+    # Path compression
+    while parents[node] != root:
+        parents[node], node = root, parents[node]
+    return root
+
+
+def _union(parents: np.ndarray, i: int, j: int) -> None:
+    root_i, root_j = _find(parents, i), _find(parents, j)
+    if root_i != root_j:
+        parents[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def _join_greedily(
+    parents: np.ndarray,
+    signatures: np.ndarray,
+    rows: np.ndarray,
+    threshold: float,
+) -> None:
+    # Each row is compared with the representatives of the clusters
+    # seen so far, joining those it's similar to or becoming a new one
+    representatives = [rows[0]]
+    for row in rows[1:]:
+        similarity = (signatures[representatives] == signatures[row]).mean(
+            axis=1
+        )
+        matches = np.flatnonzero(similarity >= threshold)
+        if len(matches) == 0:
+            representatives.append(row)
+        for match in matches:
+            _union(parents, representatives[match], row)
+
+
+def lsh_clusters(  # pylint: disable=too-many-locals
+    signatures: np.ndarray,
+    bands: int = 16,
+    threshold: float = 0.8,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Clusters near-duplicate signatures, returning a cluster id per row.
+
+    Signatures are split into `bands` bands, rows sharing a band are
+    candidates. Buckets of rows sharing a band are found by sorting
+    each band's hashes, so it's O(n log n) per band rather than
+    comparing every pair. Every member of a bucket is compared with
+    the bucket's first row, members that aren't similar to it are
+    compared with each other so a false positive first row can't keep
+    two duplicates apart. Pairs whose estimated Jaccard similarity is
+    below `threshold` are dropped before being joined with union-find.
+    Empty workouts get a cluster of their own.
+    """
+
+    n, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError("num_perm must be divisible by bands")
+    rows_per_band = num_perm // bands
+
+    parents = np.arange(n)
+    candidates = np.flatnonzero((signatures != EMPTY).any(axis=1))
+    band_weights = np.random.default_rng(seed).integers(
+        1, 1 << 63, size=rows_per_band, dtype=np.uint64
+    )
+
+    for band in range(bands):
+        band_signatures = signatures[
+            candidates, band * rows_per_band : (band + 1) * rows_per_band
+        ].astype(np.uint64)
+        keys = (band_signatures * band_weights).sum(axis=1, dtype=np.uint64)
+        order = np.argsort(keys, kind="stable")
+        rows = candidates[order]
+        sorted_keys = keys[order]
+
+        # Position of the first row of each position's bucket
+        starts = np.flatnonzero(
+            np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+        )
+        first = np.repeat(starts, np.diff(np.append(starts, len(rows))))
+        members = np.flatnonzero(first != np.arange(len(rows)))
+        left, right = rows[first[members]], rows[members]
+
+        similar = (signatures[left] == signatures[right]).mean(
+            axis=1
+        ) >= threshold
+        for i, j in zip(left[similar], right[similar]):
+            _union(parents, i, j)
+
+        # The members unlike their bucket's first row, per bucket
+        unlike = right[~similar]
+        unlike_buckets = first[members][~similar]
+        for bucket in np.split(
+            unlike, np.flatnonzero(np.diff(unlike_buckets)) + 1
+        ):
+            if len(bucket) > 1:
+                _join_greedily(parents, signatures, bucket, threshold)
+
+    # Roots are the lowest row of each cluster, so the dense ids
+    # are in order of first appearance
+    roots = np.array([_find(parents, i) for i in range(n)], dtype=np.int64)
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def near_duplicate_clusters(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    workouts: Iterable[Workout],
+    k: int = 3,
+    num_perm: int = 128,
+    bands: int = 16,
+    threshold: float = 0.8,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    Cluster id per workout url, near-duplicate workouts share an id.
+    """
+
+    workouts = list(workouts)
+    signatures = minhash_signatures(
+        [workout_shingles(workout, k=k) for workout in workouts],
+        num_perm=num_perm,
+        seed=seed,
+    )
+    clusters = lsh_clusters(
+        signatures, bands=bands, threshold=threshold, seed=seed
+    )
+    return {
+        workout["url"]: int(cluster)
+        for workout, cluster in zip(workouts, clusters)
+    }
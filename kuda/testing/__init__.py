@@ -0,0 +1,4 @@
+from kuda.testing.synthetic_bodyspace import (
+    SyntheticBodyspace,
+    generate_workout_page,
+)
@@ -0,0 +1,344 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Set, Tuple
+
+from kuda.scrapers.workout.scraper import get_workout_id
+
+HOST: str = "127.0.0.1"
+WORKOUT_PATH: str = "/workouts/viewworkoutlog/"
+
+# (name, muscle, type, equipment)
+EXERCISES: List[Tuple[str, str, str, str]] = [
+    ("Barbell Bench Press - Medium Grip", "Chest", "strength", "Barbell"),
+    ("Barbell Squat", "Quadriceps", "strength", "Barbell"),
+    ("Barbell Deadlift", "Lower Back", "strength", "Barbell"),
+    ("Wide-Grip Lat Pulldown", "Lats", "strength", "Cable"),
+    ("Seated Cable Rows", "Middle Back", "strength", "Cable"),
+    ("Standing Military Press", "Shoulders", "strength", "Barbell"),
+    ("Dumbbell Bicep Curl", "Biceps", "strength", "Dumbbell"),
+    ("Triceps Pushdown", "Triceps", "strength", "Cable"),
+    ("Leg Press", "Quadriceps", "strength", "Machine"),
+    ("Lying Leg Curls", "Hamstrings", "strength", "Machine"),
+    ("Standing Calf Raises", "Calves", "strength", "Machine"),
+    ("Crunches", "Abdominals", "strength", "Body Only"),
+]
+CARDIO_EXERCISES: List[Tuple[str, str, str, str]] = [
+    ("Elliptical Trainer", "Quadriceps", "cardio", "Machine"),
+    ("Jogging, Treadmill", "Quadriceps", "cardio", "Machine"),
+    ("Stairmaster", "Quadriceps", "cardio", "Machine"),
+]
+ENERGY_LEVELS: List[str] = ["low", "mid-low", "mid-high", "high"]
+EXERCISE_LINK: str = "http://www.bodybuilding.com/exercises/detail/view/name/"
+
+
+def _rest(label: str, class_name: str, rng: random.Random) -> str:
+    seconds = rng.choice([0, 30, 45, 60, 90, 120, 180])
+    return (
+        f'<div class="{class_name}">Rest Between {label}\n'
+        f"{seconds // 60} min {seconds % 60} sec</div>\n"
+    )
+
+
+def _time(seconds: int) -> str:
+    return (
+        f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    )
+
+
+def _performance(rng: random.Random, unit: str) -> str:
+    return f"{rng.randrange(20, 300, 5)}{unit}.x{rng.randint(1, 20)}reps."
+
+
+def _set_row(label: str, performance: str) -> str:
+    return (
+        f'<div class="set-row"><label class="left-label">{label}</label>'
+        f'<div class="inputWrapper">{performance}</div></div>\n'
+    )
+
+
+def _overview(exercises: List[Tuple[str, str, str, str]]) -> str:
+    html = '<div class="exercise-overview">\n'
+    for name, muscle, type_, equipment in exercises:
+        slug = name.lower().replace(" ", "-").replace(",", "")
+        html += (
+            f'<div class="exercise-info"><h3>{name}</h3>'
+            f'<p class="exercise-nav"><a href="{EXERCISE_LINK}{slug}">'
+            "View</a></p></div>\n"
+            '<ul class="muscles-and-equipment">'
+            f"<li><a>{muscle}</a></li><li><a>{type_}</a></li>"
+            f"<li><a>{equipment}</a></li></ul>\n"
+        )
+    return html + "</div>\n"
+
+
+def _cardio_component(rng: random.Random) -> Tuple[str, int]:
+    exercise = rng.choice(CARDIO_EXERCISES)
+    seconds = rng.randrange(60, 3600, 60)
+    if rng.random() < 0.5:
+        rows = _set_row("TIME:", _time(seconds))
+    else:
+        rows = _set_row(
+            "Time",
+            f"{seconds // 3600:02d}hr:{seconds % 3600 // 60:02d}min:"
+            f"{seconds % 60:02d}sec",
+        ) + _set_row("Heart Rate", str(rng.randint(100, 180)))
+    details = (
+        '<div class="exercise-details">\n<div class="set">\n'
+        '<div class="set-title">Cardio</div>\n'
+        f'<div class="set-body">\n{rows}</div>\n</div>\n</div>\n'
+    )
+    return _overview([exercise]) + details, seconds
+
+
+def _straight_component(
+    rng: random.Random, n_sets: int, dropset_rate: float
+) -> str:
+    exercise = rng.choice(EXERCISES)
+    unit = rng.choice(["lbs", "kg"])
+    sets = []
+    for index in range(n_sets):
+        if rng.random() < 0.3:
+            label = f"WEIGHT/REPS:\n\nTarget {rng.randint(5, 15)} reps"
+        else:
+            label = "WEIGHT/REPS:"
+        rows = _set_row(label, _performance(rng, unit))
+        if rng.random() < dropset_rate:
+            for drop in range(1, rng.randint(2, 3)):
+                rows += _set_row(
+                    f"WEIGHT/REPS: <span>Drop {drop}</span>",
+                    _performance(rng, unit),
+                )
+        sets.append(
+            '<div class="set">\n'
+            f'<div class="set-title">Set {index + 1}</div>\n'
+            f'<div class="set-body">\n{rows}</div>\n</div>\n'
+        )
+    details = _rest("Sets", "set-rest", rng).join(sets)
+    return (
+        _overview([exercise])
+        + f'<div class="exercise-details">\n{details}</div>\n'
+    )
+
+
+def _superset_component(
+    rng: random.Random, n_sets: int, n_exercises: int
+) -> str:
+    exercises = rng.sample(EXERCISES, n_exercises)
+    unit = rng.choice(["lbs", "kg"])
+    sets = []
+    for _ in range(n_sets):
+        html = '<div class="set">\n'
+        for name, *_ in exercises:
+            if rng.random() < 0.2:
+                row = _set_row("REPS:", f"{rng.randint(1, 20)}reps.")
+            else:
+                row = _set_row("WEIGHT/REPS:", _performance(rng, unit))
+            html += (
+                f'<div class="set-title">{name}</div>\n'
+                f'<div class="set-body">\n{row}</div>\n'
+            )
+        # Superset rests sit inside the set after the last exercise
+        sets.append(html + _rest("Sets", "set-rest", rng) + "</div>\n")
+    return (
+        _overview(exercises)
+        + f'<div class="exercise-details">\n{"".join(sets)}</div>\n'
+    )
+
+
+def generate_workout_page(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    rng: random.Random,
+    n_components: int = 6,
+    max_sets: int = 5,
+    superset_rate: float = 0.2,
+    dropset_rate: float = 0.1,
+    cardio_rate: float = 0.1,
+) -> str:
+    """
+    A workout log page with the markup scrape_workout expects.
+    Each workout component is cardio, a superset or straight sets
+    (some with drop sets), separated by exercise rest blocks.
+    """
+
+    components = []
+    muscles: Set[str] = set()
+    cardio_seconds = 0
+    for _ in range(n_components):
+        n_sets = rng.randint(1, max_sets)
+        kind = rng.random()
+        if kind < cardio_rate:
+            component, seconds = _cardio_component(rng)
+            cardio_seconds += seconds
+        elif kind < cardio_rate + superset_rate:
+            component = _superset_component(rng, n_sets, rng.randint(2, 3))
+        else:
+            component = _straight_component(rng, n_sets, dropset_rate)
+        muscles.update(
+            muscle for _, muscle, *_ in EXERCISES if muscle in component
+        )
+        components.append(component)
+
+    body = _rest("Exercises", "exercise-rest", rng).join(components)
+    duration = rng.randrange(600, 3 * 3600, 60) + cardio_seconds
+    return (
+        "<html>\n<body>\n"
+        '<div class="rowSectionHeader">Synthetic Workout</div>\n'
+        '<div class="musclesWorked"><span class="value">'
+        f"{', '.join(sorted(muscles))}</span></div>\n"
+        '<div class="workoutSummary">\n'
+        '<span wicketpath="logResultsPanel_workoutSummary_'
+        f'totalWorkoutTime">{_time(duration)[:5]}</span>\n'
+        '<span wicketpath="logResultsPanel_workoutSummary_'
+        f'totalCardioTime">{_time(cardio_seconds)[:5]}</span>\n'
+        f"</div>\n{body}"
+        '<div class="workout-footer">\n'
+        f'<div class="energy"><div class="{rng.choice(ENERGY_LEVELS)}">'
+        "</div></div>\n"
+        f'<div class="rating"><span class="bigRating">{rng.randint(0, 10)}'
+        "</span></div>\n</div>\n</body>\n</html>\n"
+    )
+
+
+class SyntheticBodyspace:  # pylint: disable=too-many-instance-attributes
+    """
+    Local HTTP server serving generated workout log pages at
+    `/workouts/viewworkoutlog/<username>/<workout id>`, for crawl
+    load tests. Pages are generated from a seed derived from the
+    workout id so the same link always gives the same page.
+
+    `latency` is a (min, max) seconds range added to every response,
+    `error_rate` of the requests get a random status from
+    `error_statuses` instead of a page. Extra keyword arguments are
+    passed on to `generate_workout_page`.
+    """
+
+    def __init__(
+        self,
+        latency: Tuple[float, float] = (0.0, 0.0),
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429, 500, 503),
+        seed: int = 0,
+        **page_options,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.seed = seed
+        self.page_options = page_options
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def page(self, workout_id: str) -> str:
+        """
+        The generated page of a workout id.
+        """
+
+        rng = random.Random(f"{self.seed}-{workout_id}")
+        return generate_workout_page(rng, **self.page_options)
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+            delay = self._rng.uniform(*self.latency)
+            failed = self._rng.random() < self.error_rate
+            status = self._rng.choice(self.error_statuses)
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+
+        if not handler.path.startswith(WORKOUT_PATH):
+            status, body = 404, "Not Found"
+        elif failed:
+            body = "Error"
+        else:
+            status, body = 200, self.page(get_workout_id(handler.path))
+
+        content = body.encode("utf-8")
+        try:
+            handler.send_response(status)
+            handler.send_header("Content-Type", "text/html; charset=utf-8")
+            handler.send_header("Content-Length", str(len(content)))
+            handler.end_headers()
+            handler.wfile.write(content)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and hung up, e.g. a latency longer
+            # than its fetch timeout
+            pass
+
+    @property
+    def base_url(self) -> str:
+        """
+        Workout log url prefix of the running server.
+        """
+
+        if self._server is None:
+            raise RuntimeError("Server isn't started")
+        return f"http://{HOST}:{self._server.server_port}{WORKOUT_PATH}"
+
+    def links(self, n: int, n_users: int = 100) -> List[str]:
+        """
+        n workout links spread over n_users users. Workout ids are
+        ObjectId shaped (timestamp first) like the real ones.
+        """
+
+        rng = random.Random(self.seed)
+        return [
+            f"{self.base_url}user{rng.randrange(n_users)}/"
+            f"{1262304000 + index * 3600:08x}{rng.getrandbits(64):016x}"
+            for index in range(n)
+        ]
+
+    def start(self) -> "SyntheticBodyspace":
+        """
+        Starts serving on a free local port in a background thread.
+        """
+
+        synthetic = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Hands every GET to the server, without access logs.
+            """
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """
+                Serves a page or an injected error.
+                """
+
+                # pylint: disable-next=protected-access
+                synthetic._handle(self)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((HOST, 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Shuts the server down, if it's running.
+        """
+
+        if self._server is None or self._thread is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self) -> "SyntheticBodyspace":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from kuda.aggregates import TrainingAggregates
+from kuda.aggregates.training import ALL_WEEKS, workout_week
+
+from ..vars import load_workouts
+
+
+def test_workout_week() -> None:
+    """
+    Test that the week comes from the ObjectId timestamp in the link.
+    """
+
+    workout = load_workouts()[0]
+    assert workout["name"].startswith("Nov. 20, 2018")
+    assert workout_week(workout["url"]) == "2018-W47"
+
+
+def test_incremental_ingest_matches_full_ingest(tmp_path) -> None:
+    """
+    Test that ingesting in batches, with a save/load in between and
+    re-ingested duplicates, gives the same tables as one full ingest.
+    """
+
+    workouts = load_workouts()
+
+    full = TrainingAggregates()
+    assert full.ingest(workouts) == len(workouts)
+
+    incremental = TrainingAggregates()
+    incremental.ingest(workouts[:4])
+    incremental.save(str(tmp_path))
+    incremental = TrainingAggregates.load(str(tmp_path))
+    assert incremental.ingest(workouts) == len(workouts) - 4
+    assert len(incremental) == len(workouts)
+
+    for table in ("summary", "muscle_volume", "one_rep_max"):
+        expected = getattr(full, table)()
+        actual = getattr(incremental, table)()
+        columns = list(expected.columns[:3])
+        pd.testing.assert_frame_equal(
+            expected.sort_values(columns).reset_index(drop=True),
+            actual.sort_values(columns).reset_index(drop=True),
+        )
+
+    summary = full.summary()
+    user = summary[
+        (summary.username == "coachdmurph") & (summary.week == ALL_WEEKS)
+    ].iloc[0]
+    assert user.workouts == 1
+    assert user.cardio_duration == 300
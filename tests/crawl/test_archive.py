@@ -0,0 +1,128 @@
+from kuda.cli import main
+from kuda.crawl import ArchiveReader, ArchiveWriter
+from kuda.crawl.archive import train_dictionary
+from kuda.scrapers.workout.scraper import get_workout_id
+
+from ..vars import WORKOUT_VARIANTS, load_page
+
+LINKS = [variant["link"] for variant in WORKOUT_VARIANTS]
+
+
+def test_archive_round_trip(tmp_path) -> None:
+    """
+    Test pages are readable randomly and sequentially across segments,
+    including after appending to an existing archive.
+    """
+
+    page = load_page()
+    pages = {
+        url: page.replace("7</span>", f"{i}</span>")
+        for i, url in enumerate(LINKS)
+    }
+
+    path = str(tmp_path)
+    with ArchiveWriter(path, segment_size=4096) as writer:
+        for url in LINKS[:6]:
+            writer.add(url, pages[url])
+    with ArchiveWriter(path, segment_size=4096) as writer:
+        for url in LINKS[6:]:
+            writer.add(url, pages[url])
+
+    with ArchiveReader(path) as reader:
+        assert len(list(tmp_path.glob("*.zst"))) > 2
+        assert len(reader) == len(LINKS)
+        for url in reversed(LINKS):
+            assert get_workout_id(url) in reader
+            assert reader.get(get_workout_id(url)) == pages[url]
+        assert reader.get("missing") is None
+        assert list(reader) == list(pages.items())
+
+
+def test_concurrent_writers_and_crash_recovery(tmp_path) -> None:
+    """
+    Test two writers open on one archive don't overwrite each other's
+    segments, and that an unclosed writer's pages are readable up to
+    its last index write.
+    """
+
+    page = load_page()
+    path = str(tmp_path)
+    first = ArchiveWriter(path)
+    second = ArchiveWriter(path, index_interval=3)
+    for url in LINKS[:5]:
+        first.add(url, page)
+    for url in LINKS[5:]:
+        second.add(url, page)
+    first.close()
+    # second "crashes" without being closed
+
+    with ArchiveReader(path) as reader:
+        assert len(list(tmp_path.glob("*.zst"))) == 2
+        assert set(reader.urls()) == set(LINKS[:8])
+        for url in LINKS[:8]:
+            assert reader.get_url(url) == page
+
+
+def test_archive_with_dictionary(tmp_path) -> None:
+    """
+    Test a trained dictionary is stored with the archive and used to read.
+    """
+
+    page = load_page()
+    samples = [page.replace("Chest", f"Chest {i}") for i in range(200)]
+    with ArchiveWriter(
+        str(tmp_path), dictionary=train_dictionary(samples, size=4096)
+    ) as writer:
+        writer.add(LINKS[0], page)
+    with ArchiveReader(str(tmp_path)) as reader:
+        assert reader.get_url(LINKS[0]) == page
+
+
+def test_appending_with_a_new_dictionary(tmp_path) -> None:
+    """
+    Test pages written with an older dictionary, or none, stay readable
+    after appending to the archive with a newly trained dictionary.
+    """
+
+    page = load_page()
+    path = str(tmp_path)
+    with ArchiveWriter(path) as writer:
+        writer.add(LINKS[0], page)
+    for i, url in enumerate(LINKS[1:3]):
+        samples = [page.replace("Chest", f"Chest {i} {j}") for j in range(200)]
+        with ArchiveWriter(
+            path, dictionary=train_dictionary(samples, size=4096 + i)
+        ) as writer:
+            writer.add(url, page)
+    # Without a dictionary the latest one is reused
+    with ArchiveWriter(path) as writer:
+        writer.add(LINKS[3], page)
+
+    with ArchiveReader(path) as reader:
+        for url in LINKS[:4]:
+            assert reader.get_url(url) == page
+    assert len(list(tmp_path.glob("dictionary-*.zstd"))) == 2
+
+
+def test_cli_reparse(tmp_path) -> None:
+    """
+    Test the reparse command parses every archived page.
+    """
+
+    with ArchiveWriter(str(tmp_path / "archive")) as writer:
+        for url in LINKS:
+            writer.add(url, load_page())
+
+    output = tmp_path / "workouts.jsonl"
+    exit_code = main(
+        [
+            "--dead-letters",
+            str(tmp_path / "dead_letters"),
+            "reparse",
+            str(tmp_path / "archive"),
+            "--output",
+            str(output),
+        ]
+    )
+    assert exit_code == 0
+    assert len(output.read_text().splitlines()) == len(LINKS)
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from kuda.crawl import DeadLetterStore, replay_dead_letters, scrape_workouts
+from kuda.scrapers import parse_workout
+
+from ..vars import WORKOUT_VARIANTS, load_page
+
+
+def test_failed_pages_are_dead_lettered_and_replayed(tmp_path) -> None:
+    """
+    Test that a page the parser can't handle doesn't abort the batch,
+    is stored with its html and location, and parses on replay once
+    the page (standing in for the parser) is fixed.
+    """
+
+    good_url = WORKOUT_VARIANTS[0]["link"]
+    bad_url = WORKOUT_VARIANTS[1]["link"]
+    page = load_page()
+    # No energy level in the footer
+    broken_page = page.replace('<div class="high"></div>', "")
+    pages = {good_url: page, bad_url: broken_page}
+
+    dead_letters = DeadLetterStore(str(tmp_path))
+    workouts = list(
+        scrape_workouts(
+            [bad_url, good_url], dead_letters, fetch=pages.__getitem__
+        )
+    )
+
+    assert [w["url"] for w in workouts] == [good_url]
+    assert len(dead_letters) == 1
+    dead_letter = dead_letters.get(bad_url)
+    assert dead_letter is not None
+    assert dead_letter["stage"] == "parse"
+    assert dead_letter["exception_type"] == "ValueError"
+    assert dead_letter["exception_message"] == "Energy Level not found"
+    assert "get_energy_level" in dead_letter["location"]
+    assert dead_letters.get_html(bad_url) == broken_page
+
+    # Still broken, the dead letter stays and counts the attempt
+    assert not list(replay_dead_letters(dead_letters))
+    dead_letter = dead_letters.get(bad_url)
+    assert dead_letter is not None and dead_letter["attempts"] == 2
+
+    replayed = list(
+        replay_dead_letters(
+            dead_letters, parse=lambda url, _: parse_workout(url, page)
+        )
+    )
+    assert [w["url"] for w in replayed] == [bad_url]
+    assert len(dead_letters) == 0
+
+
+def test_fetch_failures_are_dead_lettered(tmp_path) -> None:
+    """
+    Test that fetch errors are recorded without html.
+    """
+
+    def fetch(url: str) -> str:
+        raise ConnectionError("Connection refused")
+
+    url = WORKOUT_VARIANTS[0]["link"]
+    dead_letters = DeadLetterStore(str(tmp_path))
+    assert not list(scrape_workouts([url], dead_letters, fetch=fetch))
+    dead_letter = dead_letters.get(url)
+    assert dead_letter is not None and dead_letter["stage"] == "fetch"
+    assert dead_letters.get_html(url) is None
+
+
+def test_concurrent_dead_letters_for_one_url(tmp_path) -> None:
+    """
+    Test that threads dead lettering the same url don't clash, and that
+    a fetch failure drops the html of an earlier parse failure.
+    """
+
+    url = WORKOUT_VARIANTS[0]["link"]
+    dead_letters = DeadLetterStore(str(tmp_path))
+
+    def add(attempt: int) -> None:
+        dead_letters.add(url, ValueError(), stage="parse", html=str(attempt))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(add, range(200)))
+    assert len(dead_letters) == 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+    dead_letters.add(url, ConnectionError(), stage="fetch")
+    assert dead_letters.get_html(url) is None
+    assert sorted(f.suffix for f in tmp_path.iterdir()) == [".json"]
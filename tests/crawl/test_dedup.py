@@ -0,0 +1,115 @@
+import io
+import sqlite3
+
+from kuda.crawl import CrawlProgress, DeadLetterStore, ParseCache, crawl
+from kuda.scrapers import parse_workout
+
+from ..vars import WORKOUT_VARIANTS, ListSink, load_page
+
+LINKS = [variant["link"] for variant in WORKOUT_VARIANTS]
+
+
+def test_panel_hash_ignores_the_rest_of_the_page(tmp_path) -> None:
+    """
+    Test that only changes to the workout panel change the hash and
+    that cached workouts take the url and username of the new page.
+    """
+
+    page = load_page()
+    cache = ParseCache(str(tmp_path / "cache.db"))
+    key = cache.key(page)
+
+    with_ads = page.replace("<body>", '<body><div class="ad">Buy</div>')
+    assert cache.key(with_ads) == key
+    heavier = page.replace("135lbs.", "145lbs.")
+    assert cache.key(heavier) != key
+
+    assert cache.get(key, LINKS[0]) is None
+    cache.put(key, parse_workout(LINKS[0], page))
+    cache.close()
+
+    cache = ParseCache(str(tmp_path / "cache.db"))
+    workout = cache.get(key, LINKS[1])
+    assert workout == parse_workout(LINKS[1], page)
+    assert workout["username"] == "zzyt"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # A new parser version doesn't see the old results
+    cache = ParseCache(str(tmp_path / "cache.db"), version="2")
+    assert cache.get(cache.key(page), LINKS[1]) is None
+
+
+def test_crawl_with_parse_cache(tmp_path) -> None:
+    """
+    Test that a crawl of duplicate pages only parses each page once
+    and reports the cache hit rate.
+    """
+
+    page = load_page()
+    pages = {url: page for url in LINKS}
+    pages[LINKS[0]] = page.replace("135lbs.", "145lbs.")
+
+    cache = ParseCache(str(tmp_path / "cache.db"))
+    sink = ListSink()
+    stream = io.StringIO()
+    progress = crawl(
+        LINKS,
+        sink,
+        DeadLetterStore(str(tmp_path / "dead_letters")),
+        fetch_workers=1,
+        progress=CrawlProgress(stream=stream, track_cache=True),
+        fetch=pages.__getitem__,
+        parse_cache=cache,
+    )
+    progress.report()
+
+    assert len(cache) == 2
+    assert progress.cached == len(LINKS) - 2
+    assert "80.0% cache hits" in stream.getvalue()
+    assert sink.workouts == [parse_workout(url, pages[url]) for url in LINKS]
+
+
+def test_crawl_survives_cache_errors(tmp_path) -> None:
+    """
+    Test that pages are parsed as normal when the cache can't be
+    read or written, rather than aborting the crawl.
+    """
+
+    cache_path = str(tmp_path / "cache.db")
+    cache = ParseCache(cache_path, timeout=0.01)
+    # Another host holding the cache's lock
+    lock = sqlite3.connect(cache_path, isolation_level=None)
+    lock.execute("BEGIN EXCLUSIVE")
+
+    page = load_page()
+    sink = ListSink()
+    progress = crawl(
+        LINKS,
+        sink,
+        DeadLetterStore(str(tmp_path / "dead_letters")),
+        fetch_workers=2,
+        fetch=lambda _: page,
+        parse_cache=cache,
+    )
+    lock.execute("ROLLBACK")
+
+    assert (progress.done, progress.failed, progress.cached) == (
+        len(LINKS),
+        0,
+        0,
+    )
+    assert len(sink.workouts) == len(LINKS)
+
+
+def test_summary_only_hash(tmp_path) -> None:
+    """
+    Test the summary only hash ignores the exercises but not the
+    summary, and doesn't share entries with full workouts.
+    """
+
+    page = load_page()
+    cache = ParseCache(str(tmp_path / "cache.db"), summary_only=True)
+    key = cache.key(page)
+    assert cache.key(page.replace("135lbs.", "145lbs.")) == key
+    assert cache.key(page.replace("Chest", "Back")) != key
+    assert ParseCache(str(tmp_path / "cache.db")).key(page) != key
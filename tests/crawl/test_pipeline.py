@@ -0,0 +1,160 @@
+import io
+import json
+
+import pytest
+
+from kuda.cli import main
+from kuda.crawl import CrawlProgress, DeadLetterStore, crawl, read_links
+from kuda.crawl.sinks import JsonLinesSink
+from kuda.scrapers import parse_workout, stream_workout
+
+from ..vars import WORKOUT_VARIANTS, load_page
+
+
+def test_read_links(tmp_path) -> None:
+    """
+    Test reading links from the link CSV format, JSON and text files.
+    """
+
+    links = [variant["link"] for variant in WORKOUT_VARIANTS]
+
+    csv_path = tmp_path / "links.csv"
+    csv_path.write_text(
+        "Age,Links,username\n"
+        f'25,"{links[:2]!r}",a\n'
+        f'30,"{links[1:3]!r}",b\n'
+        "35,[],c\n"
+    )
+    json_path = tmp_path / "links.json"
+    json_path.write_text(json.dumps(links[:3]))
+    text_path = tmp_path / "links.txt"
+    text_path.write_text("\n".join(links[:3]) + "\n\n")
+
+    for path in (csv_path, json_path, text_path):
+        assert read_links(str(path)) == links[:3]
+
+
+def test_crawl(tmp_path) -> None:
+    """
+    Test a crawl with parser processes writes every page that parses
+    and dead letters the rest, reporting the error rate.
+    """
+
+    page = load_page()
+    links = [variant["link"] for variant in WORKOUT_VARIANTS]
+    broken_links = set(links[:3])
+
+    def fetch(url: str) -> str:
+        if url in broken_links:
+            return "<html></html>"
+        return page
+
+    output = tmp_path / "workouts.jsonl"
+    sink = JsonLinesSink(str(output))
+    stream = io.StringIO()
+    progress = crawl(
+        links,
+        sink,
+        DeadLetterStore(str(tmp_path / "dead_letters")),
+        fetch_workers=4,
+        parse_processes=2,
+        progress=CrawlProgress(total=len(links), stream=stream),
+        fetch=fetch,
+    )
+    sink.close()
+    progress.report()
+
+    workouts = [json.loads(line) for line in output.read_text().splitlines()]
+    assert {w["url"] for w in workouts} == set(links) - broken_links
+    assert progress.done == len(links)
+    assert progress.failed == len(broken_links)
+    assert "30.0% errors" in stream.getvalue()
+
+
+def test_recrawl_removes_stale_dead_letters(tmp_path) -> None:
+    """
+    Test that crawling again pages that failed before removes their
+    dead letters, so replay doesn't crawl them a second time.
+    """
+
+    links = [variant["link"] for variant in WORKOUT_VARIANTS]
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letters"))
+    dead_letters.add(links[0], ConnectionError(), stage="fetch")
+    dead_letters.add(links[1], ValueError(), stage="parse", html="<html/>")
+
+    page = load_page()
+    sink = JsonLinesSink(str(tmp_path / "workouts.jsonl"))
+    crawl(links[:3], sink, dead_letters, fetch=lambda _: page)
+    sink.close()
+    assert len(dead_letters) == 0
+    assert not list(tmp_path.joinpath("dead_letters").iterdir())
+
+
+def test_cli_replay(tmp_path) -> None:
+    """
+    Test the replay command writes re-parsed dead letters to the sink.
+    """
+
+    url = WORKOUT_VARIANTS[0]["link"]
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letters"))
+    dead_letters.add(url, ValueError(), stage="parse", html=load_page())
+
+    output = tmp_path / "replayed"
+    exit_code = main(
+        [
+            "--dead-letters",
+            dead_letters.path,
+            "replay",
+            "--output",
+            str(output),
+        ]
+    )
+    assert exit_code == 0
+    assert len(dead_letters) == 0
+    assert [p.name for p in output.iterdir()] == [
+        "5bf3ec42176a3027b0ad04d8.json"
+    ]
+
+
+def test_json_lines_sink_write_stream(tmp_path) -> None:
+    """
+    Test a streamed workout is written the same as a full one.
+    """
+
+    link = WORKOUT_VARIANTS[0]["link"]
+    output = tmp_path / "workouts.jsonl"
+    sink = JsonLinesSink(str(output))
+    sink.write_stream(*stream_workout(link, load_page()))
+    sink.write(parse_workout(link, load_page()))
+    sink.close()
+
+    streamed, full = output.read_text().splitlines()
+    assert json.loads(streamed) == json.loads(full)
+
+
+def test_json_lines_sink_write_stream_failure(tmp_path) -> None:
+    """
+    Test a workout whose components fail to parse part way through
+    leaves no partial line behind.
+    """
+
+    link = WORKOUT_VARIANTS[0]["link"]
+    workout, workout_components = stream_workout(link, load_page())
+
+    def failing_components():
+        for index, workout_component in enumerate(workout_components):
+            if index == 2:
+                raise ValueError("Weight Metric not found")
+            yield workout_component
+
+    output = tmp_path / "workouts.jsonl"
+    sink = JsonLinesSink(str(output))
+    sink.write(parse_workout(link, load_page()))
+    with pytest.raises(ValueError):
+        sink.write_stream(workout, failing_components())
+    sink.write(parse_workout(link, load_page()))
+    sink.close()
+
+    lines = output.read_text().splitlines()
+    assert len(lines) == 2
+    assert all(json.loads(line)["url"] == link for line in lines)
@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from kuda.crawl import (
+    CrawlProgress,
+    DeadLetterStore,
+    WorkQueue,
+    crawl_queue,
+    refetch_dead_letters,
+)
+from kuda.crawl.queue import Heartbeat
+from kuda.crawl.sinks import JsonLinesSink
+
+from ..vars import WORKOUT_VARIANTS, load_page
+
+LINKS = [variant["link"] for variant in WORKOUT_VARIANTS]
+
+
+class FakeClock:
+    """
+    Clock for `WorkQueue` that only moves when advanced.
+    """
+
+    def __init__(self, time: float = 1_000_000.0):
+        self.time = time
+
+    def __call__(self) -> float:
+        return self.time
+
+    def advance(self, seconds: float) -> None:
+        """
+        Moves the clock forward.
+        """
+
+        self.time += seconds
+
+
+def test_leases_are_exclusive_and_expire(tmp_path) -> None:
+    """
+    Test that leased links aren't handed out twice until the lease
+    expires, and that heartbeats keep leases alive.
+    """
+
+    clock = FakeClock()
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=5, now=clock)
+    assert queue.enqueue(LINKS) == len(LINKS)
+    assert queue.enqueue(LINKS[:2]) == 0
+
+    first = queue.lease("a", 4)
+    second = queue.lease("b", 4)
+    assert len(first) == len(second) == 4
+    assert not set(first) & set(second)
+    queue.complete("a", first)
+
+    clock.advance(3.5)
+    assert queue.heartbeat("b") == 4
+    clock.advance(2.5)
+    # b's leases were extended so only the last 2 links are left
+    assert set(queue.lease("c", 10)) == set(LINKS) - set(first + second)
+
+    clock.advance(6)
+    # b and c stopped heartbeating, their links are re-issued
+    assert set(queue.lease("d", 10)) == set(LINKS) - set(first)
+    assert queue.counts() == {
+        "pending": 0,
+        "leased": 6,
+        "done": 4,
+        "failed": 0,
+    }
+
+
+def test_links_fail_after_max_attempts(tmp_path) -> None:
+    """
+    Test that a link whose leases keep expiring is eventually failed.
+    """
+
+    clock = FakeClock()
+    queue = WorkQueue(
+        str(tmp_path / "queue.db"), lease_seconds=5, max_attempts=2, now=clock
+    )
+    queue.enqueue(LINKS[:1])
+    assert queue.lease("a", 1) == LINKS[:1]
+    clock.advance(6)
+    assert queue.lease("b", 1) == LINKS[:1]
+    clock.advance(6)
+    assert queue.lease("c", 1) == []
+    assert queue.counts()["failed"] == 1
+
+
+def test_expired_leases_cant_be_finished_by_their_old_worker(tmp_path) -> None:
+    """
+    Test that a worker whose lease expired and was re-issued can't
+    release or complete the link from under its new worker.
+    """
+
+    clock = FakeClock()
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=5, now=clock)
+    queue.enqueue(LINKS[:1])
+    assert queue.lease("a", 1) == LINKS[:1]
+    clock.advance(6)
+    assert queue.lease("b", 1) == LINKS[:1]
+
+    assert queue.release("a", LINKS[:1]) == 0
+    assert queue.complete("a", LINKS[:1]) == 0
+    assert queue.lease("c", 1) == []
+    assert queue.complete("b", LINKS[:1]) == 1
+    assert queue.counts()["done"] == 1
+
+
+def test_heartbeat_notices_lost_leases(tmp_path) -> None:
+    """
+    Test that the heartbeat flags a batch whose lease was lost.
+    """
+
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(LINKS[:2])
+    urls = queue.lease("a", 2)
+    with Heartbeat(queue, "a", 0.01, leases=len(urls)) as heartbeat:
+        assert not heartbeat.lost.wait(0.05)
+        queue.release("a", urls[:1])
+        assert heartbeat.lost.wait(1)
+
+
+def test_heartbeat_survives_errors(tmp_path, monkeypatch) -> None:
+    """
+    Test that a failing heartbeat is retried, and that the batch is
+    flagged as lost if the leases expire before one succeeds.
+    """
+
+    clock = FakeClock()
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=5, now=clock)
+    queue.enqueue(LINKS[:1])
+    urls = queue.lease("a", 1)
+    heartbeat = queue.heartbeat
+    calls = []
+    recovered = threading.Event()
+
+    def flaky_heartbeat(worker: str) -> int:
+        calls.append(worker)
+        clock.advance(1)
+        # Locked for 3 heartbeats, then for good from the 7th
+        if len(calls) <= 3 or len(calls) >= 7:
+            if len(calls) == 7:
+                recovered.set()
+            raise sqlite3.OperationalError("database is locked")
+        return heartbeat(worker)
+
+    monkeypatch.setattr(queue, "heartbeat", flaky_heartbeat)
+    with Heartbeat(queue, "a", 0.01, leases=len(urls)) as beat:
+        assert recovered.wait(1)
+        assert not beat.lost.is_set()
+        assert beat.lost.wait(1)
+    # Not until 5 seconds after the last successful heartbeat
+    assert len(calls) >= 11
+
+
+def test_workers_crawl_queue_without_duplicates(tmp_path) -> None:
+    """
+    Test that concurrent workers share the queue, each link being
+    crawled exactly once.
+    """
+
+    page = load_page()
+
+    queue_path = str(tmp_path / "queue.db")
+    WorkQueue(queue_path).enqueue(LINKS)
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letters"))
+
+    def run_worker(worker: str) -> None:
+        sink = JsonLinesSink(str(tmp_path / f"{worker}.jsonl"))
+        crawl_queue(
+            WorkQueue(queue_path),
+            worker,
+            sink,
+            dead_letters,
+            batch_size=2,
+            fetch_workers=2,
+            fetch=lambda _: page,
+        )
+        sink.close()
+
+    workers = ["a", "b", "c"]
+    with ThreadPoolExecutor(len(workers)) as pool:
+        list(pool.map(run_worker, workers))
+
+    urls = [
+        json.loads(line)["url"]
+        for worker in workers
+        for line in (tmp_path / f"{worker}.jsonl").read_text().splitlines()
+    ]
+    assert sorted(urls) == sorted(LINKS)
+    assert WorkQueue(queue_path).counts()["done"] == len(LINKS)
+
+
+def test_crawl_queue_flushes_before_completing(tmp_path) -> None:
+    """
+    Test that a batch's workouts are flushed to the sink
+    before its links are completed.
+    """
+
+    page = load_page()
+
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(LINKS)
+    done_at_flush = []
+
+    class FlushCheckingSink(JsonLinesSink):
+        """
+        Sink recording how many links were done at each flush.
+        """
+
+        def flush(self) -> None:
+            super().flush()
+            done_at_flush.append(queue.counts()["done"])
+
+    sink = FlushCheckingSink(str(tmp_path / "workouts.jsonl"))
+    crawl_queue(
+        queue,
+        "a",
+        sink,
+        DeadLetterStore(str(tmp_path / "dead_letters")),
+        batch_size=4,
+        fetch=lambda _: page,
+    )
+    sink.close()
+    assert done_at_flush == [0, 4, 8]
+
+
+def test_crawl_queue_retries_failed_fetches(tmp_path) -> None:
+    """
+    Test that pages that fail to fetch are retried by the queue
+    until they run out of attempts, and are left as fetch stage
+    dead letters that `replay --refetch` can re-crawl.
+    """
+
+    page = load_page()
+
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=3)
+    queue.enqueue(LINKS)
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letters"))
+    fetches: Dict[str, int] = {}
+
+    def fetch(url: str) -> str:
+        fetches[url] = fetches.get(url, 0) + 1
+        # The first link never fetches, the rest fail once
+        if url == LINKS[0] or fetches[url] == 1:
+            raise ConnectionError("429 Too Many Requests")
+        return page
+
+    sink = JsonLinesSink(str(tmp_path / "workouts.jsonl"))
+    progress = crawl_queue(
+        queue,
+        "a",
+        sink,
+        dead_letters,
+        batch_size=4,
+        progress=CrawlProgress(),
+        fetch=fetch,
+    )
+    sink.close()
+
+    assert fetches[LINKS[0]] == 3
+    # Retried fetches aren't counted, only the links' final outcome
+    assert (progress.done, progress.failed) == (len(LINKS), 1)
+    assert queue.counts() == {
+        "pending": 0,
+        "leased": 0,
+        "done": len(LINKS) - 1,
+        "failed": 1,
+    }
+    assert [d["url"] for d in dead_letters] == LINKS[:1]
+
+    # Still failing to fetch, then fetching
+    assert not list(refetch_dead_letters(dead_letters, fetch=fetch))
+    dead_letter = dead_letters.get(LINKS[0])
+    assert dead_letter is not None and dead_letter["attempts"] == 4
+    refetched = refetch_dead_letters(dead_letters, fetch=lambda _: page)
+    assert [workout["url"] for workout in refetched] == LINKS[:1]
+    assert len(dead_letters) == 0
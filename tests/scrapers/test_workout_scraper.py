@@ -1,12 +1,17 @@
 import json
+from typing import Any, Dict
 
 from deepdiff import DeepDiff
 
-from kuda.scrapers import scrape_workout
+from kuda.scrapers import (
+    iter_set_component_rows,
+    parse_workout,
+    parse_workout_summary,
+    scrape_workout,
+    stream_workout,
+)
 
-from ..vars import WORKOUT_VARIANTS
-
-FILE_PATH = "tests/files/"
+from ..vars import FILE_PATH, WORKOUT_VARIANTS, load_page
 
 
 def test_scraped_links() -> None:
@@ -20,12 +25,81 @@ def test_scraped_links() -> None:
     ) as f:
         tested_links = json.loads(f.read())
 
-    for index, workout in enumerate(WORKOUT_VARIANTS):
-        link = workout["link"]
+    for index, variant in enumerate(WORKOUT_VARIANTS):
+        link = variant["link"]
         print("Testing link: ", link)
-        workout = scrape_workout(link)
+        workout: Dict[str, Any] = dict(scrape_workout(link))
         assert set(tested_links[index].pop("muscles_used")) == set(
             workout.pop("muscles_used")
         )
         assert DeepDiff(tested_links[index], workout) == {}
         print("Test passed!")
+
+
+def test_parse_workout_page() -> None:
+    """
+    Test parsing a saved page with cardio, straight, drop and super sets.
+    """
+
+    page = load_page()
+
+    link = WORKOUT_VARIANTS[0]["link"]
+    workout = parse_workout(link, page)
+    assert workout["username"] == "coachdmurph"
+    assert workout["duration"] == "3180"
+    assert workout["cardio_duration"] == "300"
+    assert workout["energy_level"] == 4
+    assert workout["self_rating"] == "7"
+    assert [
+        [set_["type"] for set_ in workout_component["sets"]]
+        for workout_component in workout["workout_components"]
+    ] == [
+        ["STRAIGHT_SET"],
+        ["STRAIGHT_SET", "DROP_SET"],
+        ["SUPER_SET"],
+    ]
+
+
+def test_parse_workout_summary() -> None:
+    """
+    Test the summary only parse gives the full parse's header fields.
+    """
+
+    page = load_page()
+
+    link = WORKOUT_VARIANTS[0]["link"]
+    workout = parse_workout(link, page)
+    del workout["workout_components"]
+    assert parse_workout_summary(link, page) == workout
+
+
+def test_stream_workout() -> None:
+    """
+    Test the lazy workout components and flattened set component rows
+    match the full parse.
+    """
+
+    page = load_page()
+
+    link = WORKOUT_VARIANTS[0]["link"]
+    workout = parse_workout(link, page)
+    summary, workout_components = stream_workout(link, page)
+    assert next(workout_components) == workout["workout_components"][0]
+    assert {**summary, "workout_components": []} == {
+        **workout,
+        "workout_components": [],
+    }
+    assert list(workout_components) == workout["workout_components"][1:]
+
+    rows = list(iter_set_component_rows(link, page))
+    assert len(rows) == sum(
+        len(set_["set_components"])
+        for workout_component in workout["workout_components"]
+        for set_ in workout_component["sets"]
+    )
+    assert [row["set_type"] for row in rows[1:4]] == [
+        "STRAIGHT_SET",
+        "DROP_SET",
+        "DROP_SET",
+    ]
+    assert rows[1]["weight"] == "135"
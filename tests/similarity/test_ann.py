@@ -0,0 +1,63 @@
+import numpy as np
+
+from kuda.similarity import WorkoutIndex, embed_workouts
+from kuda.similarity.ann import EMBEDDING_SIZE
+
+from ..vars import load_workouts
+
+
+def test_embed_workouts() -> None:
+    """
+    Test that workouts embed into fixed length vectors in batch.
+    """
+
+    workouts = load_workouts()
+    vectors = embed_workouts(workouts)
+    assert vectors.shape == (len(workouts), EMBEDDING_SIZE)
+    assert vectors.dtype == np.float32
+    assert np.isfinite(vectors).all()
+
+
+def test_query_returns_itself_first(tmp_path) -> None:
+    """
+    Test that querying an indexed workout returns that workout first,
+    both before and after a save/load round trip.
+    """
+
+    workouts = load_workouts()
+    index = WorkoutIndex.build(workouts, n_tables=4, n_bits=8)
+    index.save(str(tmp_path))
+    loaded = WorkoutIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+
+    for workout in workouts:
+        for idx in (index, loaded):
+            results = idx.query(workout, k=3)
+            assert results[0][0] == workout["url"]
+            assert np.isclose(results[0][1], 1.0)
+            assert len(results) == 3
+
+
+def test_chunked_build_matches_single_chunk() -> None:
+    """
+    Test building in small chunks, from a list or a generator, gives
+    the same index as building in one chunk.
+    """
+
+    workouts = load_workouts()
+    whole = WorkoutIndex.build(workouts, n_tables=4, n_bits=8)
+    for source in (workouts, iter(workouts)):
+        chunked = WorkoutIndex.build(
+            source, n_tables=4, n_bits=8, chunk_size=3
+        )
+        assert chunked.ids == whole.ids
+        assert np.array_equal(chunked.vectors, whole.vectors)
+        assert np.array_equal(chunked.codes, whole.codes)
+        assert np.array_equal(chunked.order, whole.order)
+
+    vectors = embed_workouts(workouts)
+    ids = [workout["url"] for workout in workouts]
+    from_vectors = WorkoutIndex.from_vectors(
+        vectors, ids, n_tables=4, n_bits=8, chunk_size=3
+    )
+    assert np.array_equal(from_vectors.codes, whole.codes)
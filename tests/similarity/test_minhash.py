@@ -0,0 +1,108 @@
+import copy
+
+import numpy as np
+
+from kuda.scrapers.workout.scraper import Workout
+from kuda.similarity import near_duplicate_clusters
+from kuda.similarity.minhash import (
+    lsh_clusters,
+    minhash_signatures,
+    workout_shingles,
+)
+
+from ..vars import load_workouts
+
+
+def copy_workout(workout: Workout, username: str) -> Workout:
+    """
+    The workout as if logged by another user.
+    """
+
+    copied = copy.deepcopy(workout)
+    copied["username"] = username
+    copied["url"] = workout["url"].replace(workout["username"], username)
+    return copied
+
+
+def test_signatures_estimate_jaccard() -> None:
+    """
+    Test batched signatures match one workout at a time and that
+    their agreement estimates the shingle Jaccard similarity.
+    """
+
+    rng = np.random.default_rng(0)
+    universe = np.arange(1000, dtype=np.uint64)
+    first = rng.choice(universe, 300, replace=False)
+    second = np.concatenate([first[:200], universe[-100:]])
+    shingle_sets = [first, second, np.empty(0, dtype=np.uint64)]
+
+    batched = minhash_signatures(shingle_sets, num_perm=256, batch_size=350)
+    single = np.vstack(
+        [minhash_signatures([s], num_perm=256) for s in shingle_sets]
+    )
+    assert (batched == single).all()
+
+    jaccard = 200 / 400
+    estimate = (batched[0] == batched[1]).mean()
+    assert abs(estimate - jaccard) < 0.1
+
+
+def test_near_duplicate_clusters() -> None:
+    """
+    Test copies of a workout by other users, including a slightly
+    changed copy, share a cluster and other workouts don't.
+    """
+
+    workouts = load_workouts()
+    # The one with the most sets, so one changed set is a small change
+    original = max(workouts, key=lambda w: len(workout_shingles(w)))
+    exact = copy_workout(original, "copier")
+    changed = copy_workout(original, "tweaker")
+    changed["workout_components"][-1]["sets"][-1]["set_components"][0][
+        "reps"
+    ] = "99"
+    empty = copy_workout(workouts[4], "empty")
+
+    clusters = near_duplicate_clusters(
+        workouts + [exact, changed, empty], threshold=0.7
+    )
+
+    assert clusters[exact["url"]] == clusters[original["url"]]
+    assert clusters[changed["url"]] == clusters[original["url"]]
+    assert clusters[empty["url"]] != clusters[workouts[4]["url"]]
+    assert len(set(clusters[w["url"]] for w in workouts)) == len(workouts)
+    assert len(set(clusters.values())) == len(workouts) + 1
+
+
+def test_lsh_clusters_are_dense() -> None:
+    """
+    Test cluster ids are numbered from 0 in order of first appearance.
+    """
+
+    signatures = np.array(
+        [[1, 2, 3, 4], [5, 6, 7, 8], [1, 2, 3, 4], [9, 9, 9, 9]],
+        dtype=np.uint32,
+    )
+    assert lsh_clusters(signatures, bands=2).tolist() == [0, 1, 0, 2]
+
+
+def test_false_positives_dont_split_buckets() -> None:
+    """
+    Test two duplicates sharing a band bucket with an unlike row
+    are clustered together wherever the unlike row sorts.
+    """
+
+    duplicate = np.ones(8, dtype=np.uint32)
+    near_duplicate = duplicate.copy()
+    near_duplicate[-1] = 2
+    # Only shares the first band with the duplicates
+    unlike = np.array([1, 1, 1, 1, 9, 9, 9, 9], dtype=np.uint32)
+
+    for rows in (
+        [duplicate, unlike, near_duplicate],
+        [unlike, duplicate, near_duplicate],
+    ):
+        clusters = lsh_clusters(np.vstack(rows), bands=2, threshold=0.8)
+        unlike_row = next(i for i, r in enumerate(rows) if r is unlike)
+        others = [c for i, c in enumerate(clusters) if i != unlike_row]
+        assert others[0] == others[1] != clusters[unlike_row]
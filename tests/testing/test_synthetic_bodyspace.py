@@ -0,0 +1,73 @@
+import random
+from functools import partial
+from typing import Set
+
+from kuda.crawl import CrawlProgress, DeadLetterStore, crawl
+from kuda.scrapers import fetch_workout_page, parse_workout
+from kuda.testing import SyntheticBodyspace, generate_workout_page
+
+from ..vars import WORKOUT_VARIANTS, ListSink
+
+
+def test_generated_pages_parse() -> None:
+    """
+    Test that generated pages parse with every kind of set.
+    """
+
+    set_types: Set[object] = set()
+    for seed in range(50):
+        page = generate_workout_page(
+            random.Random(seed),
+            n_components=8,
+            superset_rate=0.3,
+            dropset_rate=0.3,
+            cardio_rate=0.2,
+        )
+        workout = parse_workout(WORKOUT_VARIANTS[0]["link"], page)
+        assert len(workout["workout_components"]) == 8
+        set_types.update(
+            set_["type"]
+            for workout_component in workout["workout_components"]
+            for set_ in workout_component["sets"]
+        )
+    assert set_types == {"STRAIGHT_SET", "SUPER_SET", "DROP_SET"}
+
+
+def test_crawl_synthetic_server(tmp_path) -> None:
+    """
+    Test a full crawl against the server, with injected errors
+    and pages slower than the timeout ending up as fetch failures.
+    """
+
+    with SyntheticBodyspace(latency=(0, 0.01)) as server:
+        links = server.links(20)
+        sink = ListSink()
+        crawl(
+            links,
+            sink,
+            DeadLetterStore(str(tmp_path / "ok")),
+            fetch_workers=4,
+            progress=CrawlProgress(total=len(links)),
+        )
+        assert sorted(w["url"] for w in sink.workouts) == sorted(links)
+        assert server.requests == len(links)
+
+    with SyntheticBodyspace(error_rate=1.0) as server:
+        links = server.links(5)
+        dead_letters = DeadLetterStore(str(tmp_path / "errors"))
+        progress = crawl(links, ListSink(), dead_letters, fetch_workers=2)
+        assert progress.failed == len(links)
+        assert {d["stage"] for d in dead_letters} == {"fetch"}
+        assert {d["exception_type"] for d in dead_letters} == {"HTTPError"}
+
+    with SyntheticBodyspace(latency=(0.5, 0.5)) as server:
+        links = server.links(2)
+        dead_letters = DeadLetterStore(str(tmp_path / "timeouts"))
+        progress = crawl(
+            links,
+            ListSink(),
+            dead_letters,
+            fetch=partial(fetch_workout_page, timeout=0.1),
+        )
+        assert progress.failed == len(links)
+        assert {d["exception_type"] for d in dead_letters} == {"ReadTimeout"}
@@ -1,5 +1,10 @@
+import json
 from typing import Dict, List
 
+from kuda.scrapers.workout.scraper import Workout
+
+FILE_PATH: str = "tests/files/"
+
 BASE_WORKOUT_URL: str = (
     "https://bodyspace.bodybuilding.com/workouts/viewworkoutlog/"
 )
@@ -66,3 +71,49 @@ WORKOUT_VARIANTS: List[Dict[str, str]] = [
         ),
     },
 ]
+
+
+def load_page() -> str:
+    """
+    The offline workout page fixture.
+    """
+
+    with open(f"{FILE_PATH}workout_page.html", "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_workouts() -> List[Workout]:
+    """
+    The parsed WORKOUT_VARIANTS workouts.
+    """
+
+    with open(
+        f"{FILE_PATH}tested_workout_links.json", "r", encoding="utf-8"
+    ) as f:
+        return json.loads(f.read())
+
+
+class ListSink:
+    """
+    Workout sink keeping the written workouts in a list.
+    """
+
+    def __init__(self) -> None:
+        self.workouts: List[Workout] = []
+
+    def write(self, workout: Workout) -> None:
+        """
+        Appends the workout to the list.
+        """
+
+        self.workouts.append(workout)
+
+    def flush(self) -> None:
+        """
+        Nothing to flush.
+        """
+
+    def close(self) -> None:
+        """
+        Nothing to close.
+        """